@@ -0,0 +1,131 @@
+########################
+# Batch Canonicalization
+########################
+
+"""
+The Inconsistent Data Entry section cleans a column in three steps - lowercase it, strip the
+whitespace, then call replace_matches_in_column() once for each value we want to tidy up
+(e.g. "south korea"). Every one of those calls scores the strings again and changes the
+DataFrame with df.loc, so cleaning a column with many canonical values (or many columns) is
+slow.
+
+canonicalize_column() does the whole thing in one go:
+
+1. Lowercase and strip the unique values only (not every row).
+2. Score every unique value against every canonical value. The unique values are split into
+batches that are scored in separate processes at the same time, each using the FuzzyIndex
+from Fuzzy_Index.py to skip strings that can't be close.
+3. Like replace_matches_in_column() in the notes, each canonical value only takes its top
+limit (10) matches that score at least min_ratio. The notes use min_ratio=47, which is fine
+when someone looks at the matches afterwards, but far too low to run unchecked over lots of
+columns: "usa" scores over 47 against "russia", "austria" and "australia". So the default
+here is DEFAULT_MIN_RATIO (90, the "ratio > 90" from the notes' comments), and spellings that
+score lower than that, like "usofa", are better given as extra spellings (below). Check the
+matches (match_canonical() returns them) before lowering it.
+4. If a value is in the top matches of more than one canonical value, the one with the
+highest score wins. Ties (in the top limit or between canonical values) are broken by the
+order of the canonical values and then alphabetically, so the result is always the same no
+matter how the work was split up.
+5. Replace the values in the column with a single map() call.
+
+professors['Country'] = canonicalize_column(professors['Country'], ["south korea", "usa"])
+
+Canonical values can also be given as a dictionary of extra spellings that should be
+matched, e.g. {"usa": ["united states", "us of a"]}.
+
+Note: On Windows, code that starts new processes has to be run from inside an
+if __name__ == '__main__': block.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from Fuzzy_Index import FuzzyIndex
+
+# below this many unique values it is faster to score them all in this process
+MIN_UNIQUES_PER_PROCESS = 2000
+# the lowest score that counts as a match
+DEFAULT_MIN_RATIO = 90
+
+
+def _as_spellings(canonical):
+    """Return a list of (canonical value, spelling to match) pairs, in order."""
+    if isinstance(canonical, str):
+        canonical = [canonical]
+    if isinstance(canonical, dict):
+        return [(value, spelling)
+                for value, extra in canonical.items()
+                for spelling in [value] + list(extra)]
+    return [(value, value) for value in canonical]
+
+
+def _top(candidates, limit):
+    # the best scores first. Ties go to the earlier spelling and then to the string that sorts
+    # first, so the order is always the same no matter how the work was split up
+    ranked = sorted(candidates, key=lambda match: (-match[1], match[2], match[0]))
+    return ranked if limit is None else ranked[:limit]
+
+
+def _best_matches(args):
+    """Score one batch of unique strings against every spelling and return a dictionary of
+    {canonical value: [(string, score, spelling number), ...]} with the top limit strings of
+    the batch for each canonical value that scored at least min_ratio.
+    """
+    strings, spellings, min_ratio, limit = args
+    index = FuzzyIndex(strings)
+    best = {}
+    for number, (value, spelling) in enumerate(spellings):
+        found = best.setdefault(value, {})
+        for string, score in index.extract(spelling, limit=None, min_ratio=min_ratio):
+            # a string matched by several spellings of the same value keeps its best score
+            if string not in found or (-score, number) < (-found[string][1], found[string][2]):
+                found[string] = (string, score, number)
+    return {value: _top(found.values(), limit) for value, found in best.items()}
+
+
+def match_canonical(strings, canonical, min_ratio=DEFAULT_MIN_RATIO, limit=10, processes=None):
+    """Return a dictionary mapping each string that is close to a canonical value to that
+    canonical value. Strings that aren't close to any of them are left out.
+
+    Like replace_matches_in_column() in the notes, each canonical value only takes its top
+    limit matches (limit=None takes every match above min_ratio).
+    """
+    spellings = _as_spellings(canonical)
+    strings = [s for s in strings if isinstance(s, str)]
+    if processes is None:
+        processes = os.cpu_count() or 1
+    processes = max(1, min(processes, len(strings) // MIN_UNIQUES_PER_PROCESS))
+
+    # split the strings into one batch per process
+    batches = [(strings[i::processes], spellings, min_ratio, limit) for i in range(processes)]
+    if processes == 1:
+        results = [_best_matches(batches[0])]
+    else:
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            results = list(executor.map(_best_matches, batches))
+
+    # each string is in exactly one batch, so the overall top limit of a canonical value is
+    # the top limit of its batches' top limits put together
+    best = {}
+    for value in dict.fromkeys(value for value, spelling in spellings):
+        for string, score, number in _top([match for result in results for match in result.get(value, [])],
+                                          limit):
+            # a string in the top matches of more than one canonical value goes to the higher
+            # score, and for equal scores to the earlier spelling
+            if string not in best or (-score, number) < (-best[string][0], best[string][1]):
+                best[string] = (score, number)
+    return {string: spellings[number][0] for string, (score, number) in best.items()}
+
+
+def canonicalize_column(column, canonical, min_ratio=DEFAULT_MIN_RATIO, limit=10, processes=None):
+    """Return column lowercased, stripped and with every value that is close to one of the
+    canonical values replaced by it (at most limit different values per canonical value).
+    """
+    # clean the unique values only, then work out what each one should become
+    cleaned = {value: value.lower().strip() if isinstance(value, str) else value
+               for value in column.dropna().unique()}
+    strings = sorted({value for value in cleaned.values() if isinstance(value, str)})
+    matches = match_canonical(strings, canonical, min_ratio, limit, processes)
+
+    final = {original: matches.get(value, value) for original, value in cleaned.items()}
+    return column.map(final)
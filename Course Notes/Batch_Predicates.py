@@ -0,0 +1,164 @@
+##################
+# Batch Predicates
+##################
+
+"""
+Three of the small functions in the Python notes check a condition one value at a time:
+
+def count_negatives(nums):
+    return len([num for num in nums if num < 0])
+
+def has_lucky_number(nums):
+    return any([num % 7 == 0 for num in nums])
+
+def exactly_one_topping(ketchup, mustard, onion):
+    sum = int(ketchup) + int(mustard) + int(onion)
+    return sum == 1
+
+They are fine for a handful of values, but not for millions of them:
+
+- count_negatives() builds a whole new list only to count how long it is.
+- has_lucky_number() builds the whole list of True/False before any() sees it, so it checks
+every number even when the very first one is lucky. (any() on its own stops at the first True,
+but only if it is given a generator instead of a list.)
+- exactly_one_topping() answers for one hot dog at a time.
+
+The *_array versions below work on NumPy arrays or pandas columns and let NumPy do the looping:
+
+count_negatives_array(values)                 # one comparison over the whole array
+has_lucky_number_array(values)                # checks blocks, stops at the first lucky block
+exactly_one_topping_array(orders.ketchup, orders.mustard, orders.onion)   # every order at once
+
+has_lucky_number_array() starts with a small block and doubles it each time, so a lucky
+number near the start is found after a few thousand checks, and a long array with no lucky
+number at all still only takes a handful of NumPy calls.
+
+count_negatives(), has_lucky_number() and exactly_one_topping() keep the same arguments as
+the originals and just call the array versions. benchmark() times them against the originals.
+"""
+
+import time
+
+import numpy as np
+import pandas as pd
+
+# has_lucky_number_array() checks this many values first, then twice as many each time
+FIRST_BLOCK = 4096
+MAX_BLOCK = 1 << 20
+
+
+def count_negatives_original(nums):
+    return len([num for num in nums if num < 0])
+
+
+def has_lucky_number_original(nums):
+    return any([num % 7 == 0 for num in nums])
+
+
+def exactly_one_topping_original(ketchup, mustard, onion):
+    sum = int(ketchup) + int(mustard) + int(onion)
+    return sum == 1
+
+
+def count_negatives_array(values, axis=None):
+    """Return how many values are below 0 (or how many in each row, with axis=1)."""
+    return np.count_nonzero(np.asarray(values) < 0, axis=axis)
+
+
+def has_lucky_number_array(values, axis=None):
+    """Return whether any value is divisible by 7.
+
+    With axis=None the values are checked a block at a time, stopping at the first block with
+    a lucky number in it. With axis=1 every row of a 2D array gets its own answer.
+    """
+    values = np.asarray(values)
+    if axis is not None:
+        return (values % 7 == 0).any(axis=axis)
+    values = values.ravel()
+    start = 0
+    block = FIRST_BLOCK
+    while start < len(values):
+        if (values[start:start + block] % 7 == 0).any():
+            return True
+        start += block
+        block = min(block * 2, MAX_BLOCK)
+    return False
+
+
+def exactly_one_topping_array(ketchup, mustard, onion):
+    """Return whether each customer wants exactly one of the three toppings.
+
+    Takes three arrays or columns of True/False; a pandas column in gives a pandas column out.
+    """
+    total = (np.asarray(ketchup, dtype=np.int8) + np.asarray(mustard, dtype=np.int8)
+             + np.asarray(onion, dtype=np.int8))
+    result = total == 1
+    if isinstance(ketchup, pd.Series):
+        return pd.Series(result, index=ketchup.index)
+    return result
+
+
+def count_negatives(nums):
+    """Return the number of negative numbers in the given list."""
+    return int(count_negatives_array(nums))
+
+
+def has_lucky_number(nums):
+    """Return whether the given list of numbers is lucky. A lucky list contains at least one
+    number divisible by 7.
+    """
+    return bool(has_lucky_number_array(nums))
+
+
+def exactly_one_topping(ketchup, mustard, onion):
+    """Return whether the customer wants exactly one of the three available toppings
+    on their hot dog.
+    """
+    return bool(exactly_one_topping_array(ketchup, mustard, onion))
+
+
+def _time(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+def benchmark(n_values=10000000, seed=0):
+    """Time the list comprehension originals against the array versions on n_values values."""
+    rng = np.random.default_rng(seed)
+    nums = rng.integers(-1000, 1000, size=n_values)
+    # no number divisible by 7, except (in lucky_nums) one near the start
+    unlucky_nums = nums - nums % 7 + 1
+    lucky_nums = unlucky_nums.copy()
+    lucky_nums[100] = 14
+    ketchup, mustard, onion = (rng.random((3, n_values)) < 0.4)
+
+    num_list = nums.tolist()
+    cases = [
+        ('count_negatives', count_negatives_original, (num_list,), count_negatives_array, (nums,)),
+        ('has_lucky_number (no lucky number)', has_lucky_number_original, (unlucky_nums.tolist(),),
+         has_lucky_number_array, (unlucky_nums,)),
+        ('has_lucky_number (lucky number early)', has_lucky_number_original, (lucky_nums.tolist(),),
+         has_lucky_number_array, (lucky_nums,)),
+    ]
+
+    print("Values:", n_values)
+    for name, original, original_args, array_version, array_args in cases:
+        expected, original_seconds = _time(original, *original_args)
+        result, array_seconds = _time(array_version, *array_args)
+        assert result == expected
+        print("{:<40} list: {:.3f}s  array: {:.5f}s  speedup: {:,.0f}x".format(
+            name, original_seconds, array_seconds, original_seconds / array_seconds))
+
+    triples = list(zip(ketchup.tolist(), mustard.tolist(), onion.tolist()))
+    start = time.perf_counter()
+    expected = [exactly_one_topping_original(*triple) for triple in triples]
+    original_seconds = time.perf_counter() - start
+    result, array_seconds = _time(exactly_one_topping_array, ketchup, mustard, onion)
+    assert result.tolist() == expected
+    print("{:<40} list: {:.3f}s  array: {:.5f}s  speedup: {:,.0f}x".format(
+        'exactly_one_topping', original_seconds, array_seconds, original_seconds / array_seconds))
+
+
+if __name__ == '__main__':
+    benchmark()
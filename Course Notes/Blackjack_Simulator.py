@@ -0,0 +1,295 @@
+#####################
+# Blackjack Simulator
+#####################
+
+"""
+The Python notes have a hand_total() helper that scores one blackjack hand at a time, and
+describe the Monte Carlo method: play the game many, many times and average the results.
+
+Scoring hands one at a time in a Python loop is slow when we want millions of games. But
+every hand is scored the same way, so we can score all of them at once with NumPy:
+
+- Cards are stored as numbers (0 for an ace, 1 for a 2, ... 12 for a king) and looked up in a
+table of points, with every ace counted as 1.
+- An ace can only ever be "upgraded" from 1 to 11 once - a second upgrade would add another
+10 and a hand with two 11s is already at 22. So the whole while loop in hand_total() becomes
+"add 10 where the hand has an ace and the total is 11 or less", which is one np.where().
+
+hand_totals() scores a whole array of hands at once and gives the same answer as hand_total()
+for every hand.
+
+simulate() plays millions of games of the Kaggle course's blackjack: the player gets two cards
+and the dealer one, the player hits for as long as their strategy says to, and then the dealer
+hits until they have 17 or more. The player wins if the dealer busts or the player ends up
+closer to 21; ties go to the dealer. Every game is played at the same time, one round of
+"hit or stand" after another.
+
+A strategy is any function that takes NumPy arrays of (dealer_total, player_total,
+player_low_aces, player_high_aces) - the same arguments as the course's should_hit() - and
+returns an array of True (hit) / False (stand). StandOn(17) hits until the total reaches 17.
+
+win_rates = simulate([StandOn(total) for total in range(12, 21)], n_games=10000000)
+
+The games are split into batches, and each batch gets its own random numbers made from the
+seed and the batch number. The batches are shared out between processes, so the answer is
+the same whatever the number of processes. Every strategy plays the same starting hands.
+
+Note: On Windows, code that starts new processes has to be run from inside an
+if __name__ == '__main__': block.
+"""
+
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+CARDS = ['A', '2', '3', '4', '5', '6', '7', '8', '9', '10', 'J', 'Q', 'K']
+ACE = 0
+# the points of each card, counting aces as 1. The 0 at the end is what NO_CARD (-1) looks up
+POINTS = np.array([1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 10, 10, 10, 0], dtype=np.int64)
+NO_CARD = -1
+
+DEFAULT_BATCH_SIZE = 1000000
+DEALER_STANDS_ON = 17
+
+
+def hand_total(hand):
+    """Helper function to calculate the total points of a blackjack hand (from the Python notes)."""
+    total = 0
+    # Count the number of aces and deal with how to apply them at the end.
+    aces = 0
+    for card in hand:
+        if card in ['J', 'Q', 'K']:
+            total += 10
+        elif card == 'A':
+            aces += 1
+        else:
+            # Convert number cards (e.g. '7') to ints
+            total += int(card)
+    # At this point, total is the sum of this hand's cards *not counting aces*.
+
+    # Add aces, counting them as 1 for now. This is the smallest total we can make from this hand
+    total += aces
+    # "Upgrade" aces from 1 to 11 as long as it helps us get closer to 21
+    # without busting
+    while total + 10 <= 21 and aces > 0:
+        # Upgrade an ace from 1 to 11
+        total += 10
+        aces -= 1
+    return total
+
+
+def blackjack_hand_greater_than(hand_1, hand_2):
+    total_1 = hand_total(hand_1)
+    total_2 = hand_total(hand_2)
+    return total_1 <= 21 and (total_1 > total_2 or total_2 > 21)
+
+
+def hand_codes(hands):
+    """Turn a list of hands like [['A', 'K'], ['2', '3', '4']] into a 2D array of card numbers.
+
+    Shorter hands are padded with NO_CARD, which counts as 0 points.
+    """
+    width = max((len(hand) for hand in hands), default=0)
+    codes = np.full((len(hands), width), NO_CARD, dtype=np.int8)
+    for row, hand in enumerate(hands):
+        codes[row, :len(hand)] = [CARDS.index(card) for card in hand]
+    return codes
+
+
+def upgraded_totals(low_totals, aces):
+    """Return the best totals, given the totals with every ace counted as 1."""
+    return np.where((aces > 0) & (low_totals <= 11), low_totals + 10, low_totals)
+
+
+def hand_totals(codes):
+    """Return the total of every hand (row) of a 2D array of card numbers, like hand_total()."""
+    codes = np.asarray(codes)
+    low_totals = POINTS[codes].sum(axis=1)
+    aces = (codes == ACE).sum(axis=1)
+    return upgraded_totals(low_totals, aces)
+
+
+def hands_greater_than(totals_1, totals_2):
+    """The same as blackjack_hand_greater_than(), for whole arrays of hand totals."""
+    return (totals_1 <= 21) & ((totals_1 > totals_2) | (totals_2 > 21))
+
+
+class StandOn:
+    """A strategy that hits until the player's total is at least total."""
+
+    def __init__(self, total):
+        self.total = total
+
+    def __call__(self, dealer_total, player_total, player_low_aces, player_high_aces):
+        return player_total < self.total
+
+    def __eq__(self, other):
+        return isinstance(other, StandOn) and other.total == self.total
+
+    def __hash__(self):
+        return hash(('StandOn', self.total))
+
+    def __repr__(self):
+        return 'StandOn({})'.format(self.total)
+
+
+class _Hands:
+    """The running state of many hands: their totals with aces as 1, and how many aces."""
+
+    def __init__(self, codes):
+        self.low_totals = POINTS[codes].sum(axis=1)
+        self.aces = (codes == ACE).sum(axis=1)
+
+    def add(self, rows, codes):
+        self.low_totals[rows] += POINTS[codes]
+        self.aces[rows] += codes == ACE
+
+    @property
+    def totals(self):
+        return upgraded_totals(self.low_totals, self.aces)
+
+    def totals_of(self, rows):
+        return upgraded_totals(self.low_totals[rows], self.aces[rows])
+
+
+def _deal(rng, shape):
+    return rng.integers(0, len(CARDS), size=shape, dtype=np.int8)
+
+
+def play(strategy, rng, n_games):
+    """Play n_games games with strategy, and return an array of True (won) / False (lost)."""
+    player = _Hands(_deal(rng, (n_games, 2)))
+    dealer = _Hands(_deal(rng, (n_games, 1)))
+
+    # the player's turn: one round of hits at a time, for every game that is still hitting.
+    # An ace is only ever upgraded once, so there is one high ace if the total went up by 10
+    playing = np.arange(n_games)
+    while len(playing):
+        totals = player.totals_of(playing)
+        high_aces = (totals != player.low_totals[playing]).astype(np.int64)
+        hits = strategy(dealer.totals_of(playing), totals, player.aces[playing] - high_aces, high_aces)
+        playing = playing[np.asarray(hits, dtype=bool)]
+        player.add(playing, _deal(rng, len(playing)))
+        # a hand that just went over 21 is done
+        playing = playing[player.totals_of(playing) <= 21]
+
+    # the dealer's turn, only in games where the player didn't bust
+    player_totals = player.totals
+    drawing = np.flatnonzero((player_totals <= 21) & (dealer.totals < DEALER_STANDS_ON))
+    while len(drawing):
+        dealer.add(drawing, _deal(rng, len(drawing)))
+        drawing = drawing[dealer.totals_of(drawing) < DEALER_STANDS_ON]
+
+    return hands_greater_than(player_totals, dealer.totals)
+
+
+def _batch_seeds(seed, n_games, batch_size):
+    """Return (seed sequence, games) for each batch. They only depend on seed and batch_size."""
+    sizes = [batch_size] * (n_games // batch_size)
+    if n_games % batch_size:
+        sizes.append(n_games % batch_size)
+    return list(zip(np.random.SeedSequence(seed).spawn(len(sizes)), sizes))
+
+
+def _play_batch(args):
+    strategies, seed_sequence, n_games = args
+    wins = []
+    for strategy in strategies:
+        # a fresh generator from the same seed for each strategy, so they all get the same
+        # starting hands
+        wins.append(int(play(strategy, np.random.default_rng(seed_sequence), n_games).sum()))
+    return wins
+
+
+def simulate(strategies, n_games=1000000, seed=0, processes=None, batch_size=DEFAULT_BATCH_SIZE,
+             verbose=True):
+    """Play n_games games with each strategy and return a dictionary of {strategy: win rate}."""
+    single = callable(strategies)
+    if single:
+        strategies = [strategies]
+    jobs = [(strategies, seed_sequence, games)
+            for seed_sequence, games in _batch_seeds(seed, n_games, batch_size)]
+    if processes is None:
+        processes = os.cpu_count() or 1
+    processes = max(1, min(processes, len(jobs)))
+
+    start = time.perf_counter()
+    if processes == 1:
+        results = [_play_batch(job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            results = list(executor.map(_play_batch, jobs))
+    seconds = time.perf_counter() - start
+
+    wins = np.array(results, dtype=np.int64).reshape(len(jobs), len(strategies)).sum(axis=0)
+    win_rates = {strategy: float(wins[i] / n_games) for i, strategy in enumerate(strategies)}
+    if verbose:
+        hands = n_games * len(strategies)
+        print("Played {:,} games in {:.2f}s with {} process(es): {:,.0f} hands/second".format(
+            hands, seconds, processes, hands / seconds))
+    return win_rates[strategies[0]] if single else win_rates
+
+
+def play_scalar(should_hit, n_games=100000, seed=0):
+    """The same game played one hand at a time in plain Python, using hand_total()."""
+    rng = random.Random(seed)
+    wins = 0
+    for _ in range(n_games):
+        player = [rng.choice(CARDS), rng.choice(CARDS)]
+        dealer = [rng.choice(CARDS)]
+        while hand_total(player) <= 21:
+            total = hand_total(player)
+            aces = player.count('A')
+            low_total = sum(1 if card == 'A' else hand_total([card]) for card in player)
+            high_aces = int(total != low_total)
+            if not should_hit(hand_total(dealer), total, aces - high_aces, high_aces):
+                break
+            player.append(rng.choice(CARDS))
+        if hand_total(player) <= 21:
+            while hand_total(dealer) < DEALER_STANDS_ON:
+                dealer.append(rng.choice(CARDS))
+        wins += blackjack_hand_greater_than(player, dealer)
+    return wins / n_games
+
+
+def check_hand_totals(n_hands=100000, max_cards=12, seed=0):
+    """Check hand_totals() against hand_total() on random hands of 0 to max_cards cards."""
+    rng = np.random.default_rng(seed)
+    hands = [[CARDS[code] for code in rng.integers(0, len(CARDS), size=rng.integers(0, max_cards + 1))]
+             for _ in range(n_hands)]
+    expected = np.array([hand_total(hand) for hand in hands])
+    mismatches = np.flatnonzero(hand_totals(hand_codes(hands)) != expected)
+    if len(mismatches):
+        raise AssertionError("hand_totals() disagrees with hand_total() on {}".format(
+            hands[mismatches[0]]))
+    return True
+
+
+def benchmark(n_games=200000, seed=0):
+    """Time the plain Python game against the NumPy one, for the StandOn(17) strategy."""
+    check_hand_totals()
+    strategy = StandOn(17)
+
+    start = time.perf_counter()
+    scalar_rate = play_scalar(strategy, n_games, seed)
+    scalar_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    rate = simulate(strategy, n_games, seed, processes=1, verbose=False)
+    seconds = time.perf_counter() - start
+
+    print("Games:", n_games)
+    print("Plain Python: {:.3f}s ({:,.0f} hands/second), win rate {:.4f}".format(
+        scalar_seconds, n_games / scalar_seconds, scalar_rate))
+    print("NumPy:        {:.3f}s ({:,.0f} hands/second), win rate {:.4f}".format(
+        seconds, n_games / seconds, rate))
+    print("Speedup: {:,.0f}x".format(scalar_seconds / seconds))
+    return scalar_seconds, seconds
+
+
+if __name__ == '__main__':
+    benchmark()
+    simulate([StandOn(total) for total in range(12, 21)], n_games=10000000)
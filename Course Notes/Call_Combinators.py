@@ -0,0 +1,161 @@
+##################
+# Call Combinators
+##################
+
+"""
+The Python notes pass functions to other functions:
+
+def call(fn, arg):
+    return fn(arg)
+
+def squared_call(fn, arg):
+    return fn(fn(arg))
+
+max(100, 51, 14, key=mod_5)
+
+When fn is slow and gets called with the same arguments again and again (say, an expensive
+per-key transform used on every row), all of that work is repeated. Remembering the answers
+("memoizing") fixes that:
+
+slow_transform = Memoized(slow_transform, maxsize=10000)         # keep the 10,000 latest
+slow_transform = Memoized(slow_transform, ttl=60)                # forget after 60 seconds
+slow_transform.stats()       # {'hits': ..., 'misses': ..., 'evictions': ..., 'size': ...}
+
+Once more than maxsize answers are remembered, the one used least recently is forgotten
+(an "LRU" cache). With ttl=, an answer older than ttl seconds is worked out again.
+
+call_n(fn, arg, n) calls fn n times, each time on the result of the last call - call() is
+call_n(fn, arg, 1) and squared_call() is call_n(fn, arg, 2). repeated(fn, n) makes that into
+a new function, and with memoize=True every one of the n calls is memoized, so chains that
+share inner steps (fn(fn(x)) and fn(fn(fn(x))), say) only work each step out once.
+
+max_by() and min_by() are max() and min() with a key, but they also give back the key of the
+winner, and min_max_by() finds both in one go - calling max() and then min() would call the
+key function twice for every item:
+
+lowest, highest = min_max_by([100, 51, 14], key=mod_5)     # ((100, 0), (14, 4))
+"""
+
+import time
+from collections import OrderedDict
+
+_MISSING = object()
+
+
+class Memoized:
+    """Wraps fn (a function of one hashable argument) and remembers its answers."""
+
+    def __init__(self, fn, maxsize=128, ttl=None, clock=time.monotonic):
+        self.fn = fn
+        # None means remember every answer
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        # argument -> (answer, time it was worked out). The order is least recently used first
+        self.cache = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __call__(self, arg):
+        entry = self.cache.get(arg, _MISSING)
+        if entry is not _MISSING:
+            answer, made_at = entry
+            if self.ttl is None or self.clock() - made_at < self.ttl:
+                self.hits += 1
+                self.cache.move_to_end(arg)
+                return answer
+            # too old - work it out again below
+            del self.cache[arg]
+            self.evictions += 1
+
+        self.misses += 1
+        answer = self.fn(arg)
+        self.cache[arg] = (answer, self.clock() if self.ttl is not None else None)
+        if self.maxsize is not None and len(self.cache) > self.maxsize:
+            self.cache.popitem(last=False)
+            self.evictions += 1
+        return answer
+
+    def stats(self):
+        calls = self.hits + self.misses
+        return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                'size': len(self.cache), 'hit_rate': self.hits / calls if calls else 0.0}
+
+    def clear(self):
+        """Forget every answer (the hit/miss counts are kept)."""
+        self.cache.clear()
+
+
+def call(fn, arg):
+    """Call fn on arg"""
+    return fn(arg)
+
+
+def squared_call(fn, arg):
+    """Call fn on the result of calling fn on arg"""
+    return fn(fn(arg))
+
+
+def call_n(fn, arg, n):
+    """Call fn n times, each time on the result of the last call: fn(fn(...fn(arg)))."""
+    for _ in range(n):
+        arg = fn(arg)
+    return arg
+
+
+def repeated(fn, n, memoize=False, maxsize=128, ttl=None):
+    """Return a function that calls fn n times in a row, like call_n(fn, arg, n).
+
+    With memoize=True every call of fn goes through a Memoized(fn, maxsize, ttl), which is
+    kept as the returned function's .fn (for its stats()).
+    """
+    step = Memoized(fn, maxsize=maxsize, ttl=ttl) if memoize else fn
+
+    def repeated_fn(arg):
+        return call_n(step, arg, n)
+
+    repeated_fn.fn = step
+    return repeated_fn
+
+
+def _best_by(items, key, better, default):
+    best_item = best_key = _MISSING
+    for item in items:
+        item_key = key(item)
+        # only a strictly better key replaces the best, so ties keep the first item like
+        # max() and min() do
+        if best_key is _MISSING or better(item_key, best_key):
+            best_item, best_key = item, item_key
+    if best_key is _MISSING:
+        if default is _MISSING:
+            raise ValueError("arg is an empty sequence")
+        return default
+    return best_item, best_key
+
+
+def max_by(items, key, default=_MISSING):
+    """Return (item, key(item)) for the item max(items, key=key) picks."""
+    return _best_by(items, key, lambda a, b: a > b, default)
+
+
+def min_by(items, key, default=_MISSING):
+    """Return (item, key(item)) for the item min(items, key=key) picks."""
+    return _best_by(items, key, lambda a, b: a < b, default)
+
+
+def min_max_by(items, key):
+    """Return ((min item, its key), (max item, its key)), calling key once per item."""
+    lowest = highest = None
+    for item in items:
+        item_key = key(item)
+        if lowest is None:
+            lowest = highest = (item, item_key)
+            continue
+        if item_key < lowest[1]:
+            lowest = (item, item_key)
+        if item_key > highest[1]:
+            highest = (item, item_key)
+    if lowest is None:
+        raise ValueError("arg is an empty sequence")
+    return lowest, highest
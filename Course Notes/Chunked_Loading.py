@@ -0,0 +1,165 @@
+#################################
+# Chunked (Streaming) CSV Loading
+#################################
+
+"""
+pd.read_csv() normally reads the whole file into memory in one go. That is fine for the wine
+reviews, but the NFL play by play file is several GB and reading it all at once can run the
+computer out of memory.
+
+Passing chunksize= to pd.read_csv() makes it return the file a few rows at a time instead
+(each chunk is a normal DataFrame). As long as we only keep a small summary of each chunk
+around, memory use depends on the chunk size instead of on the size of the file.
+
+The functions below run the same steps as the Data Cleaning notes, but one chunk at a time:
+
+# number of missing data points per column, and the total number of cells
+missing_values_count, total_cells = count_missing(read_csv_chunks(nfl_path))
+percent_missing = (missing_values_count.sum() / total_cells) * 100
+
+# the same as nfl_data.fillna(method='bfill', axis=0).fillna(0), one chunk at a time
+for chunk in bfill_chunks(nfl_path):
+    chunk = chunk.fillna(0)
+    ...
+
+# the same as reviews.region_1.fillna('Unknown').value_counts()
+reviews_per_region = value_counts_chunks(read_csv_chunks(wine_path, index_col=0),
+                                         'region_1', fill_value='Unknown')
+"""
+
+import sys
+
+import numpy as np
+import pandas as pd
+
+# resource is only available on Linux/macOS, so peak_rss_mb() returns None on Windows
+try:
+    import resource
+except ImportError:
+    resource = None
+
+DEFAULT_CHUNKSIZE = 100000
+
+
+def read_csv_chunks(path, chunksize=DEFAULT_CHUNKSIZE, **read_csv_kwargs):
+    """Yield the CSV file at path as DataFrames of at most chunksize rows each.
+
+    Any other keyword arguments (index_col, usecols, dtype, ...) are passed to pd.read_csv().
+    """
+    with pd.read_csv(path, chunksize=chunksize, **read_csv_kwargs) as reader:
+        for chunk in reader:
+            yield chunk
+
+
+def count_missing(chunks):
+    """Return (missing_values_count, total_cells) for a stream of chunks.
+
+    missing_values_count is the same Series as df.isnull().sum() on the whole file and
+    total_cells is the same number as np.product(df.shape).
+    """
+    missing_values_count = None
+    total_cells = 0
+    for chunk in chunks:
+        chunk_count = chunk.isnull().sum()
+        if missing_values_count is None:
+            missing_values_count = chunk_count
+        else:
+            missing_values_count = missing_values_count.add(chunk_count, fill_value=0)
+        total_cells += chunk.shape[0] * chunk.shape[1]
+
+    if missing_values_count is None:
+        return pd.Series(dtype='int64'), 0
+    return missing_values_count.astype('int64'), total_cells
+
+
+def _first_valid_values(chunk):
+    """Return the first non-missing value of each column in chunk (NaN if there isn't one)."""
+    return chunk.bfill().iloc[0] if len(chunk) else pd.Series(index=chunk.columns, dtype=object)
+
+
+def bfill_chunks(path, chunksize=DEFAULT_CHUNKSIZE, **read_csv_kwargs):
+    """Yield the chunks of the CSV file at path with missing values backfilled.
+
+    The result is the same as df.fillna(method='bfill', axis=0) on the whole file, split into
+    chunks. A missing value at the end of a chunk has to be filled from a later chunk, so the
+    file is read twice: the first pass only remembers the first non-missing value of every
+    column in every chunk (one small row per chunk), and the second pass fills each chunk
+    using those values. Memory use stays bounded by the chunk size either way.
+    """
+    return bfill_chunk_stream(lambda: read_csv_chunks(path, chunksize, **read_csv_kwargs))
+
+
+def bfill_chunk_stream(make_chunks):
+    """bfill_chunks() for any stream of DataFrame chunks that can be made twice.
+
+    make_chunks() is called once for each pass and has to give the same chunks both times.
+    """
+    # pass 1 - the first non-missing value of each column, for every chunk
+    firsts = [_first_valid_values(chunk) for chunk in make_chunks()]
+
+    # work backwards so that next_values[i] holds the first non-missing value that comes
+    # after chunk i (this is what the bottom of chunk i should be backfilled with)
+    next_values = [None] * len(firsts)
+    following = None
+    for i in range(len(firsts) - 1, -1, -1):
+        next_values[i] = following
+        following = firsts[i] if following is None else firsts[i].fillna(following)
+
+    # pass 2 - backfill inside the chunk, then fill whatever is left from the later chunks
+    for i, chunk in enumerate(make_chunks()):
+        chunk = chunk.bfill()
+        if next_values[i] is not None and chunk.isnull().values.any():
+            fill = next_values[i].dropna()
+            # only fill columns that actually have something to fill them with
+            chunk = chunk.fillna({column: value for column, value in fill.items()})
+        yield chunk
+
+
+def value_counts_chunks(chunks, column, fill_value=None):
+    """Return the same Series as df[column].value_counts() for a stream of chunks.
+
+    If fill_value is given, missing values are replaced with it first, like
+    df[column].fillna(fill_value).value_counts(). The result is sorted with the most common
+    value first, and values with the same count come in the order they first appear in the
+    file, like they do in value_counts().
+    """
+    partial_counts = []
+    for chunk in chunks:
+        values = chunk[column]
+        if fill_value is not None:
+            values = values.fillna(fill_value)
+        # factorize() numbers the values in the order they first appear in the chunk (and
+        # gives missing values -1), so the counts come out in that order too
+        codes, uniques = pd.factorize(values)
+        counts = np.bincount(codes[codes >= 0], minlength=len(uniques))
+        partial_counts.append(pd.Series(counts, index=pd.Index(uniques)))
+
+    if not partial_counts:
+        return pd.Series(dtype='int64', name='count')
+
+    # add the counts of each chunk together. sort=False keeps the values in the order they
+    # were first seen in the file, which is the order value_counts() keeps equal counts in
+    counts = pd.concat(partial_counts).groupby(level=0, sort=False).sum()
+    counts.index.name = column
+    counts.name = 'count'
+    return counts.astype('int64').sort_values(ascending=False, kind='stable')
+
+
+def peak_rss_mb():
+    """Return the peak memory (resident set size) this process has used so far, in MB."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports this number in KB, macOS reports it in bytes
+    if sys.platform == 'darwin':
+        return peak / (1024 * 1024)
+    return peak / 1024
+
+
+if __name__ == '__main__':
+    nfl_path = "../input/nflplaybyplay2009to2016/NFL Play by Play 2009-2017 (v4).csv"
+
+    missing_values_count, total_cells = count_missing(read_csv_chunks(nfl_path, low_memory=False))
+    print(missing_values_count[0:10])
+    print("Percent missing:", (missing_values_count.sum() / total_cells) * 100)
+    print("Peak memory (MB):", peak_rss_mb())
@@ -0,0 +1,196 @@
+###################
+# Fast Date Parsing
+###################
+
+"""
+The Parsing Dates section of the Data Cleaning notes shows two ways to call pd.to_datetime():
+
+landslides['date_parsed'] = pd.to_datetime(landslides['date'], format="%m/%d/%y")
+landslides['date_parsed'] = pd.to_datetime(landslides['Date'], infer_datetime_format=True)
+
+Giving the format is much faster, but only works when every date in the column is written
+the same way. Inferring the format works on messy columns, but it is slow.
+
+parse_dates() gets the best of both. It looks at a sample of the column to work out which
+formats are used, then parses the column with an explicit format= for each of them (one
+fast pass per format instead of guessing row by row):
+
+formats = detect_formats(landslides['date'])       # e.g. ['%m/%d/%y', '%d/%m/%Y']
+landslides['date_parsed'] = parse_dates(landslides['date'], formats)
+
+Detecting the formats only has to be done once per column. A FormatCache saves the formats
+to a small JSON file so the next time the same file is loaded they are reused:
+
+cache = FormatCache("date_formats.json")
+landslides['date_parsed'] = parse_dates(landslides['date'], cache=cache, source="catalog.csv")
+
+The notes also say to check that days and months didn't get mixed up by plotting the day of
+the month on a histogram. flag_swapped_dates() does that check for us - it marks the rows that
+don't fit the column's main format but would fit if the day and month were swapped
+(e.g. "13/01/07" in a column of "%m/%d/%y" dates).
+"""
+
+import json
+import os
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+# the formats detect_formats() tries, in the order it tries them. Where a date could be read
+# more than one way (like 1/2/07), the format that comes first wins
+CANDIDATE_FORMATS = [
+    '%m/%d/%y', '%m/%d/%Y', '%d/%m/%y', '%d/%m/%Y',
+    '%m-%d-%y', '%m-%d-%Y', '%d-%m-%y', '%d-%m-%Y',
+    '%Y-%m-%d', '%Y/%m/%d', '%Y-%m-%d %H:%M:%S', '%Y-%m-%dT%H:%M:%S',
+    '%d.%m.%Y', '%d.%m.%y', '%Y%m%d',
+    '%b %d, %Y', '%B %d, %Y', '%d %b %Y', '%d %B %Y',
+]
+
+DEFAULT_SAMPLE_SIZE = 1000
+
+
+def _matches(value, format):
+    try:
+        datetime.strptime(value, format)
+        return True
+    except ValueError:
+        return False
+
+
+def detect_formats(column, sample_size=DEFAULT_SAMPLE_SIZE, candidates=CANDIDATE_FORMATS, seed=0):
+    """Return the date formats used in column, most common first.
+
+    Only a random sample of sample_size values is checked, so very rare formats may be missed
+    (parse_dates() notices when that happens and detects the formats of the leftover rows).
+    """
+    values = pd.Series(column.dropna().unique()).astype(str).str.strip()
+    if len(values) > sample_size:
+        values = values.sample(sample_size, random_state=seed)
+
+    counts = {}
+    for value in values:
+        for format in candidates:
+            if _matches(value, format):
+                counts[format] = counts.get(format, 0) + 1
+                break
+
+    # most common first, and ties keep the order of candidates
+    return sorted(counts, key=lambda format: (-counts[format], candidates.index(format)))
+
+
+class FormatCache:
+    """Remembers the date formats detected for each (source, column) in a JSON file."""
+
+    def __init__(self, path='date_formats.json'):
+        self.path = path
+        self.formats = {}
+        if os.path.exists(path):
+            with open(path) as file:
+                self.formats = json.load(file)
+
+    @staticmethod
+    def key(source, column_name):
+        return '{}::{}'.format(source, column_name)
+
+    def get(self, source, column_name):
+        """Return the cached formats for the column, or None if it hasn't been seen before."""
+        return self.formats.get(self.key(source, column_name))
+
+    def set(self, source, column_name, formats):
+        """Save the formats for the column to the cache file."""
+        self.formats[self.key(source, column_name)] = list(formats)
+        with open(self.path, 'w') as file:
+            json.dump(self.formats, file, indent=2, sort_keys=True)
+
+
+def _parse_with_formats(values, formats):
+    """Parse values with each format in turn, each one only on the rows still unparsed."""
+    parsed = pd.Series(pd.NaT, index=values.index, dtype='datetime64[ns]')
+    format_used = pd.Series(None, index=values.index, dtype=object)
+    for format in formats:
+        remaining = parsed.isnull() & values.notnull()
+        if not remaining.any():
+            break
+        attempt = pd.to_datetime(values[remaining], format=format, errors='coerce')
+        worked = attempt.notnull()
+        parsed.loc[attempt.index[worked]] = attempt[worked]
+        format_used.loc[attempt.index[worked]] = format
+    return parsed, format_used
+
+
+def parse_dates(column, formats=None, cache=None, source=None, return_formats=False):
+    """Return column parsed as dates using one explicit-format pass per format.
+
+    If formats isn't given they come from cache (for the given source and column name), or
+    are detected with detect_formats(). source (e.g. the file name) is required with cache,
+    since the formats are cached per source and column name. Values that don't match any
+    format become NaT. If return_formats is True, a Series saying which format parsed each
+    row is also returned.
+    """
+    if cache is not None and source is None:
+        raise ValueError("source is needed to look up the column in the cache, "
+                         "e.g. source='catalog.csv'")
+
+    values = column.astype(object)
+    present = values.notnull()
+    values[present] = values[present].astype(str).str.strip()
+
+    if formats is None and cache is not None:
+        formats = cache.get(source, column.name)
+    detected = formats is None
+    if detected:
+        formats = detect_formats(values)
+
+    parsed, format_used = _parse_with_formats(values, formats)
+
+    # if some rows didn't fit any format (e.g. a format that wasn't in the sample), look for
+    # formats in just those rows and add them to the list
+    leftover = parsed.isnull() & values.notnull()
+    if leftover.any():
+        extra = [format for format in detect_formats(values[leftover]) if format not in formats]
+        if extra:
+            more_parsed, more_used = _parse_with_formats(values[leftover], extra)
+            parsed.loc[more_parsed.index] = more_parsed
+            format_used.loc[more_used.index] = more_used
+            formats = list(formats) + extra
+            detected = True
+
+    if cache is not None and detected:
+        cache.set(source, column.name, formats)
+
+    parsed.name = column.name
+    if return_formats:
+        return parsed, format_used
+    return parsed
+
+
+def swap_day_month(format):
+    """Return format with %d and %m swapped, e.g. '%m/%d/%y' -> '%d/%m/%y'."""
+    return format.replace('%d', '\0').replace('%m', '%d').replace('\0', '%m')
+
+
+def flag_swapped_dates(column, formats=None):
+    """Return a boolean Series marking the rows that look like their day and month were
+    swapped compared to the rest of the column.
+
+    A row is flagged when it was parsed with a format that is the day/month swap of a format
+    used by more rows - e.g. '13/01/07' in a column that is mostly '%m/%d/%y'.
+    """
+    parsed, format_used = parse_dates(column, formats, return_formats=True)
+    counts = format_used.value_counts()
+
+    flagged = pd.Series(False, index=column.index, name=column.name)
+    for format, count in counts.items():
+        swapped = swap_day_month(format)
+        if swapped != format and counts.get(swapped, 0) > count:
+            flagged |= (format_used == format).to_numpy()
+    return flagged
+
+
+def check_day_of_month(parsed):
+    """Return the count of each day of the month in the parsed dates, the same numbers the
+    histogram in the notes shows. Every day from 1 to 31 is listed, even if it has no dates.
+    """
+    days = parsed.dropna().dt.day
+    return days.value_counts().reindex(np.arange(1, 32), fill_value=0).rename('count')
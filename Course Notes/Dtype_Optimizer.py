@@ -0,0 +1,193 @@
+#################
+# Dtype Optimizer
+#################
+
+"""
+The Data Types and Missing Values section of the Pandas notes shows that read_csv() stores
+strings as 'object' and numbers as int64/float64. That is the safe choice, but it wastes a lot
+of memory:
+
+- An object column stores a separate Python string for every row. In the wine reviews the
+country, province, variety and taster_name columns only have a few hundred different values
+between them, repeated over 130k rows. The 'category' dtype stores each different value once
+and then just a small integer code per row.
+- int64 uses 8 bytes per number even when the numbers would fit in 1 byte (points only goes
+from 80 to 100, so int8 can hold them). But the smaller type only holds the values, not
+whatever is worked out from them: arithmetic on an int8 column stays int8 and wraps around
+with no warning when the answer doesn't fit (reviews.points * 2 turns 100 into -56). So this
+is only done with downcast_integers=True, for columns that are only counted, grouped or
+compared, and always to signed types (unsigned ones wrap even on points - 100).
+- float64 could be shrunk to float32 when the column only holds whole numbers (price is
+a float64 column only because some prices are missing). The values stay the same, but sums,
+means and standard deviations are then added up in float32 and come out (slightly)
+different, so this one is only done with downcast_floats=True.
+
+optimize_dtypes() looks at each column and makes the conversions that are safe (and the two
+above only when asked for):
+
+reviews = pd.read_csv("../input/wine-reviews/winemag-data-130k-v2.csv", index_col=0)
+reviews, report = optimize_dtypes(reviews)
+print(report)
+
+report is a DataFrame with the old and new dtype of each column and how many bytes were saved.
+
+Note: groupby() on a category column also lists categories that have no rows unless
+observed=True is passed, so optimize_dtypes() only makes categories out of the values that
+are actually in the column. Results of groupby(..., observed=True) (including sum, mean, min
+and max of the numeric columns), value_counts() and astype(str) stay the same as before the
+conversion - check_same_results() checks this.
+"""
+
+import numpy as np
+import pandas as pd
+
+# a string column becomes a category when it has at most this fraction of unique values
+DEFAULT_MAX_UNIQUE_RATIO = 0.5
+
+
+def _is_string_column(column):
+    if column.dtype == object:
+        # only convert columns that hold strings (and missing values), not mixed objects
+        values = column.dropna()
+        return values.map(type).eq(str).all()
+    return pd.api.types.is_string_dtype(column.dtype) and not isinstance(column.dtype, pd.CategoricalDtype)
+
+
+def _downcast_integers(column):
+    # pd.to_numeric() picks the smallest signed int type that fits every value
+    return pd.to_numeric(column, downcast='integer')
+
+
+def _downcast_floats(column):
+    values = column.dropna()
+    # float32 can hold every whole number up to 2**24 exactly, and those print the same way
+    # in float32 as in float64 (so astype(str) doesn't change). This covers columns like
+    # price, which are whole numbers that were only made floats by their missing values
+    if (values == np.floor(values)).all() and values.abs().max() < 2 ** 24:
+        return column.astype(np.float32)
+    return column
+
+
+def optimize_column(column, max_unique_ratio=DEFAULT_MAX_UNIQUE_RATIO, downcast_integers=False,
+                    downcast_floats=False):
+    """Return column converted to the smallest dtype that holds exactly the same values.
+
+    Strings with few unique values become 'category'. With downcast_integers=True, integers
+    are downcast to the smallest signed integer type that fits (arithmetic on them can then
+    overflow - see above), and with downcast_floats=True, floats holding only whole numbers
+    are downcast to float32 (this changes sums and means). Anything else is returned as it is.
+    """
+    if len(column) == 0:
+        return column
+
+    if pd.api.types.is_bool_dtype(column.dtype):
+        return column
+    if pd.api.types.is_integer_dtype(column.dtype):
+        return _downcast_integers(column) if downcast_integers else column
+    if pd.api.types.is_float_dtype(column.dtype):
+        return _downcast_floats(column) if downcast_floats else column
+    if _is_string_column(column):
+        if column.nunique() <= max_unique_ratio * len(column):
+            return column.astype('category')
+    return column
+
+
+def optimize_dtypes(df, max_unique_ratio=DEFAULT_MAX_UNIQUE_RATIO, columns=None, downcast_integers=False,
+                    downcast_floats=False):
+    """Return (optimized_df, report) where optimized_df is a copy of df with every column
+    converted by optimize_column() and report lists the memory saved per column.
+
+    If columns is given, only those columns are converted.
+    """
+    if columns is None:
+        columns = df.columns
+
+    optimized = df.copy()
+    rows = []
+    for name in columns:
+        before = df[name]
+        after = optimize_column(before, max_unique_ratio, downcast_integers, downcast_floats)
+        optimized[name] = after
+        # deep=True counts the memory used by the Python strings in object columns too
+        bytes_before = before.memory_usage(index=False, deep=True)
+        bytes_after = after.memory_usage(index=False, deep=True)
+        rows.append({
+            'column': name,
+            'old_dtype': str(before.dtype),
+            'new_dtype': str(after.dtype),
+            'bytes_before': bytes_before,
+            'bytes_after': bytes_after,
+            'bytes_saved': bytes_before - bytes_after,
+        })
+
+    report = pd.DataFrame(rows, columns=['column', 'old_dtype', 'new_dtype', 'bytes_before',
+                                         'bytes_after', 'bytes_saved']).set_index('column')
+    return optimized, report
+
+
+def read_csv_optimized(path, max_unique_ratio=DEFAULT_MAX_UNIQUE_RATIO, downcast_integers=False,
+                       downcast_floats=False, **read_csv_kwargs):
+    """Return pd.read_csv(path, **read_csv_kwargs) with optimize_dtypes() applied.
+
+    The report is printed so we can see how much memory was saved.
+    """
+    df, report = optimize_dtypes(pd.read_csv(path, **read_csv_kwargs), max_unique_ratio,
+                                 downcast_integers=downcast_integers, downcast_floats=downcast_floats)
+    print(report)
+    print("Total saved: {:,} bytes".format(report.bytes_saved.sum()))
+    return df
+
+
+AGGREGATIONS = ['sum', 'mean', 'min', 'max']
+
+
+def _is_number_column(column):
+    return pd.api.types.is_numeric_dtype(column.dtype) and not pd.api.types.is_bool_dtype(column.dtype)
+
+
+def check_same_results(original, optimized, columns=None):
+    """Raise an AssertionError if groupby (and the sum/mean/min/max of the numeric columns
+    per group), value_counts, astype(str) or simple arithmetic give a different answer on the
+    optimized DataFrame than on the original one.
+    """
+    if columns is None:
+        columns = original.columns
+    numbers = [name for name in columns if _is_number_column(original[name])]
+
+    for name in numbers:
+        # the whole column, with no rounding allowed
+        before = original[name].agg(AGGREGATIONS + ['std'])
+        after = optimized[name].agg(AGGREGATIONS + ['std'])
+        pd.testing.assert_series_equal(before, after, check_dtype=False, check_exact=True, obj=name)
+
+        # arithmetic between columns of the same type stays in that type, so a small int type
+        # wraps around when the answer doesn't fit
+        for arithmetic in (lambda column: column + column, lambda column: column * column):
+            pd.testing.assert_series_equal(arithmetic(original[name]), arithmetic(optimized[name]),
+                                           check_dtype=False, check_exact=True, obj=name)
+
+    for name in columns:
+        before = original[name]
+        after = optimized[name]
+
+        pd.testing.assert_series_equal(before.astype(str), after.astype(str), check_dtype=False)
+
+        # compare the counts as plain dicts - the index dtype is allowed to change
+        assert before.value_counts().to_dict() == after.value_counts().to_dict(), name
+        assert before.isnull().sum() == after.isnull().sum(), name
+
+        # group the row numbers by the column and check the same rows end up in each group
+        positions = pd.Series(np.arange(len(before)), index=before.index)
+        groups_before = positions.groupby(before, observed=True).sum().to_dict()
+        groups_after = positions.groupby(after, observed=True).sum().to_dict()
+        assert groups_before == groups_after, name
+
+        for number in numbers:
+            if number == name:
+                continue
+            aggregated_before = original[number].groupby(before, observed=True).agg(AGGREGATIONS)
+            aggregated_after = optimized[number].groupby(after, observed=True).agg(AGGREGATIONS)
+            # the group labels may now be categories
+            aggregated_after.index = aggregated_after.index.astype(aggregated_before.index.dtype)
+            pd.testing.assert_frame_equal(aggregated_before, aggregated_after, check_dtype=False,
+                                          check_exact=True, obj='{} by {}'.format(number, name))
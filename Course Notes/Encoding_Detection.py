@@ -0,0 +1,180 @@
+##############################
+# Streaming Encoding Detection
+##############################
+
+"""
+The Reading in files with encoding problems section guesses a file's encoding from its first
+ten thousand bytes:
+
+with open("../input/kickstarter-projects/ks-projects-201801.csv", 'rb') as rawdata:
+    result = chardet.detect(rawdata.read(10000))
+
+and then reads the whole file into a DataFrame just to save it again as UTF-8. Two problems:
+
+- The first 10 KB of a big export is often plain ASCII (English project names), so chardet
+guesses 'ascii' and reading the rest of the file fails on the first accented character.
+- Building a DataFrame just to re-save the file reads and writes everything twice.
+
+detect_encoding() reads the file a chunk at a time, skipping the chunks that are plain ASCII,
+and feeds the rest to chardet until its guess stops changing - so it reads as much of the
+file as it needs to and no more. transcode_to_utf8() then converts the file to UTF-8 a chunk
+at a time, without ever making a DataFrame. The detected encoding is saved in a small "sidecar" file next to the
+original (ks-projects-201801.csv.encoding.json), so the next time we don't detect it again.
+
+encoding = detect_encoding("../input/kickstarter-projects/ks-projects-201801.csv")
+transcode_to_utf8("../input/kickstarter-projects/ks-projects-201801.csv",
+                  "ks-projects-201801-utf8.csv")
+
+# or just read it with the right encoding
+kickstarter_2016 = read_csv_detected("../input/kickstarter-projects/ks-projects-201801.csv")
+"""
+
+import codecs
+import copy
+import json
+import os
+
+import chardet
+import pandas as pd
+
+DEFAULT_CHUNK_SIZE = 64 * 1024
+# how sure chardet has to be, and for how many chunks in a row, before we stop reading
+# (chardet rarely goes above 0.73 for single-byte encodings like Windows-1252)
+DEFAULT_MIN_CONFIDENCE = 0.5
+DEFAULT_PATIENCE = 3
+
+
+def sidecar_path(path):
+    """Return the path of the file that stores the detected encoding of path."""
+    return path + '.encoding.json'
+
+
+def _file_stamp(path):
+    stat = os.stat(path)
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+def _read_sidecar(path):
+    """Return the saved detection result for path, or None if there isn't an up to date one."""
+    try:
+        with open(sidecar_path(path)) as file:
+            saved = json.load(file)
+    except (OSError, ValueError):
+        return None
+    stamp = _file_stamp(path)
+    if saved.get('size') != stamp['size'] or saved.get('mtime_ns') != stamp['mtime_ns']:
+        return None
+    return saved
+
+
+def _write_sidecar(path, result):
+    saved = dict(result, **_file_stamp(path))
+    with open(sidecar_path(path), 'w') as file:
+        json.dump(saved, file, indent=2)
+
+
+def _peek(detector):
+    """Return the detector's current guess without stopping it."""
+    finished = copy.deepcopy(detector)
+    finished.close()
+    return finished.result
+
+
+def detect_encoding_stream(chunks, min_confidence=DEFAULT_MIN_CONFIDENCE, patience=DEFAULT_PATIENCE):
+    """Return chardet's result ({'encoding', 'confidence', ...}) for a stream of byte chunks,
+    plus the number of bytes that were read.
+
+    Chunks are fed to chardet until it is done, or until it has given the same answer with
+    at least min_confidence for patience chunks in a row. Chunks that are plain ASCII are
+    skipped, since they look the same in every encoding and would only make chardet guess
+    'ascii'. If the whole stream is ASCII, the result is 'ascii'.
+    """
+    detector = chardet.UniversalDetector()
+    bytes_read = 0
+    fed_anything = False
+    last_guess = None
+    agreeing = 0
+    for chunk in chunks:
+        bytes_read += len(chunk)
+        if chunk.isascii():
+            continue
+        detector.feed(chunk)
+        fed_anything = True
+        if detector.done:
+            break
+
+        result = _peek(detector)
+        guess = (result['encoding'] or '').lower()
+        if guess and result['confidence'] >= min_confidence:
+            agreeing = agreeing + 1 if guess == last_guess else 1
+        else:
+            agreeing = 0
+        last_guess = guess
+        if agreeing >= patience:
+            break
+
+    if not fed_anything:
+        return {'encoding': 'ascii', 'confidence': 1.0, 'language': ''}, bytes_read
+    detector.close()
+    return detector.result, bytes_read
+
+
+def _read_chunks(file, chunk_size):
+    while True:
+        chunk = file.read(chunk_size)
+        if not chunk:
+            return
+        yield chunk
+
+
+def detect_encoding(path, chunk_size=DEFAULT_CHUNK_SIZE, min_confidence=DEFAULT_MIN_CONFIDENCE,
+                    patience=DEFAULT_PATIENCE, use_sidecar=True):
+    """Return the encoding of the file at path (e.g. 'Windows-1252').
+
+    The result is saved next to the file, and reused as long as the file hasn't changed.
+    """
+    if use_sidecar:
+        saved = _read_sidecar(path)
+        if saved is not None:
+            return saved['encoding']
+
+    with open(path, 'rb') as file:
+        result, bytes_read = detect_encoding_stream(_read_chunks(file, chunk_size), min_confidence, patience)
+    if result['encoding'] is None:
+        raise ValueError("Could not detect the encoding of {}".format(path))
+
+    if use_sidecar:
+        _write_sidecar(path, {'encoding': result['encoding'],
+                              'confidence': result['confidence'],
+                              'bytes_read': bytes_read})
+    return result['encoding']
+
+
+def transcode_to_utf8(source, destination, encoding=None, chunk_size=DEFAULT_CHUNK_SIZE, errors='strict'):
+    """Copy the file at source to destination, converted to UTF-8, one chunk at a time.
+
+    If encoding isn't given it is found with detect_encoding(). Only one chunk is held in
+    memory at a time. errors works like it does in bytes.decode() ('strict', 'replace', ...).
+    Returns the encoding the file was converted from.
+    """
+    if encoding is None:
+        encoding = detect_encoding(source)
+
+    # an incremental decoder remembers a character that was cut in half at the end of a
+    # chunk, and finishes it when the next chunk arrives
+    decoder = codecs.getincrementaldecoder(encoding)(errors=errors)
+    temporary = destination + '.tmp'
+    with open(source, 'rb') as infile, open(temporary, 'wb') as outfile:
+        for chunk in _read_chunks(infile, chunk_size):
+            outfile.write(decoder.decode(chunk).encode('utf-8'))
+        outfile.write(decoder.decode(b'', final=True).encode('utf-8'))
+    os.replace(temporary, destination)
+
+    # the new file is UTF-8, so save that too and it never has to be detected
+    _write_sidecar(destination, {'encoding': 'utf-8', 'confidence': 1.0, 'bytes_read': 0})
+    return encoding
+
+
+def read_csv_detected(path, **read_csv_kwargs):
+    """Return pd.read_csv(path) using the encoding found by detect_encoding()."""
+    return pd.read_csv(path, encoding=detect_encoding(path), **read_csv_kwargs)
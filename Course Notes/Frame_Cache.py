@@ -0,0 +1,185 @@
+####################
+# Cached CSV Loading
+####################
+
+"""
+Every exercise in the Pandas and Data Cleaning notes starts with pd.read_csv(), and reading a
+big CSV means turning every line of text back into numbers and strings. That work is the same
+every time we run the notebook, so it only needs to be done once.
+
+cached_read_csv() is a drop-in replacement for pd.read_csv(). The first time a file is read
+it gets parsed as normal, and then the DataFrame is saved to a cache folder in a columnar format
+(Feather or Parquet), which pandas can load back almost instantly - there is no text to
+parse, and Feather files can be memory-mapped so the data is only read from disk when it is
+actually used.
+
+reviews = cached_read_csv("../input/wine-reviews/winemag-data-130k-v2.csv", index_col=0)
+kickstarters_2017 = cached_read_csv("../input/kickstarter-projects/ks-projects-201801.csv")
+landslides = cached_read_csv("../input/landslide-events/catalog.csv")
+
+The saved copy is matched to the CSV using a "fingerprint" made from the file's path, size
+and last-modified time, plus the options given to read_csv() (index_col, dtype,
+parse_dates, ...). If the CSV changes or the options are different, the fingerprint no
+longer matches and the file is parsed again.
+
+Arrow doesn't have every pandas dtype (an object column of strings comes back as 'str'), so
+the dtypes read_csv() gave are saved in the cached file too and put back when it is loaded.
+Files whose dtypes can't be put back that way aren't cached.
+
+Note: This needs the pyarrow package (pip install pyarrow). Without it, cached_read_csv()
+just calls pd.read_csv() every time.
+"""
+
+import hashlib
+import json
+import os
+import warnings
+
+import pandas as pd
+
+# pyarrow is what reads and writes Feather/Parquet files, but it isn't always installed
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+    import pyarrow.parquet as parquet
+except ImportError:
+    pa = None
+
+DEFAULT_CACHE_DIR = '.csv_cache'
+FORMATS = ('feather', 'parquet')
+# where the original dtypes are kept in the cached file's metadata
+DTYPES_KEY = b'cached_read_csv.dtypes'
+
+
+def _hash(text):
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()[:16]
+
+
+def cache_key(path, read_csv_kwargs):
+    """Return the (source, fingerprint) pair used to name the cached copy of path.
+
+    source changes when the file or the read_csv() options change, and fingerprint changes
+    when the contents of the file change (its size or last-modified time).
+    """
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    options = repr(sorted(read_csv_kwargs.items()))
+    source = _hash(path + '|' + options)
+    fingerprint = _hash('{}|{}'.format(stat.st_mtime_ns, stat.st_size))
+    return source, fingerprint
+
+
+def cache_path(path, read_csv_kwargs, cache_dir=DEFAULT_CACHE_DIR, format='feather'):
+    """Return where the cached copy of path (read with read_csv_kwargs) is stored."""
+    source, fingerprint = cache_key(path, read_csv_kwargs)
+    name = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(cache_dir, '{}-{}-{}.{}'.format(name, source, fingerprint, format))
+
+
+def _remove_stale(cached, cache_dir):
+    """Delete older cached copies of the same file (same source, different fingerprint)."""
+    prefix = os.path.basename(cached).rsplit('-', 1)[0] + '-'
+    extension = os.path.splitext(cached)[1]
+    for name in os.listdir(cache_dir):
+        old = os.path.join(cache_dir, name)
+        if name.startswith(prefix) and name.endswith(extension) and old != cached:
+            os.remove(old)
+
+
+def _dtypes(df):
+    """Return the names of the dtypes of df's columns and index levels, in order."""
+    levels = [df.index.get_level_values(level) for level in range(df.index.nlevels)]
+    return {'columns': [str(dtype) for dtype in df.dtypes],
+            'index': [str(level.dtype) for level in levels]}
+
+
+def _restore_dtypes(df, dtypes):
+    """Convert the columns and index levels of df back to dtypes (from _dtypes()).
+
+    Arrow doesn't have all of pandas' types, so some come back as a different one - an object
+    column of strings comes back as 'str', for example.
+    """
+    for position, dtype in enumerate(dtypes['columns']):
+        if str(df.dtypes.iloc[position]) != dtype:
+            df.isetitem(position, df.iloc[:, position].astype(dtype))
+    levels = [df.index.get_level_values(level) for level in range(df.index.nlevels)]
+    if [str(level.dtype) for level in levels] != dtypes['index']:
+        levels = [level.astype(dtype) for level, dtype in zip(levels, dtypes['index'])]
+        df.index = pd.MultiIndex.from_arrays(levels) if len(levels) > 1 else levels[0]
+    return df
+
+
+def _write(df, cached, format):
+    # from_pandas() keeps the index (including index_col=0 and MultiIndexes) in the file
+    table = pa.Table.from_pandas(df)
+    metadata = dict(table.schema.metadata or {})
+    metadata[DTYPES_KEY] = json.dumps(_dtypes(df)).encode('utf-8')
+    table = table.replace_schema_metadata(metadata)
+    # write to a temporary file first, so a half-written file is never mistaken for a cache
+    temporary = cached + '.tmp'
+    if format == 'feather':
+        # uncompressed, so the file can be memory-mapped when it is read back
+        feather.write_feather(table, temporary, compression='uncompressed')
+    else:
+        parquet.write_table(table, temporary)
+    os.replace(temporary, cached)
+
+
+def _read(cached, format):
+    if format == 'feather':
+        table = feather.read_table(cached, memory_map=True)
+    else:
+        table = parquet.read_table(cached, memory_map=True)
+    dtypes = json.loads(table.schema.metadata[DTYPES_KEY])
+    df = _restore_dtypes(table.to_pandas(), dtypes)
+    if _dtypes(df) != dtypes:
+        raise ValueError("the dtypes {} couldn't be restored".format(dtypes))
+    return df
+
+
+def cached_read_csv(path, cache_dir=DEFAULT_CACHE_DIR, format='feather', **read_csv_kwargs):
+    """Return pd.read_csv(path, **read_csv_kwargs), reusing a cached columnar copy if the
+    CSV and the options haven't changed since the last time it was read.
+
+    format is either 'feather' (fastest to load) or 'parquet' (smaller files).
+    """
+    if format not in FORMATS:
+        raise ValueError("format must be one of {}, not {!r}".format(FORMATS, format))
+    if pa is None:
+        return pd.read_csv(path, **read_csv_kwargs)
+
+    cached = cache_path(path, read_csv_kwargs, cache_dir, format)
+    if os.path.exists(cached):
+        try:
+            return _read(cached, format)
+        except (pa.ArrowException, KeyError, TypeError, ValueError) as error:
+            # written by an older version without the dtypes, or they can't be restored
+            warnings.warn("Could not use the cached copy of {}: {}".format(path, error))
+            os.remove(cached)
+
+    df = pd.read_csv(path, **read_csv_kwargs)
+    os.makedirs(cache_dir, exist_ok=True)
+    try:
+        _write(df, cached, format)
+        # check the cached copy really loads back with the same dtypes as read_csv() gave
+        _read(cached, format)
+    except (pa.ArrowException, TypeError, ValueError) as error:
+        # columns with a mix of types (e.g. numbers and strings in one object column) can't
+        # be stored in Arrow, and some dtypes can't be restored, so just skip the cache for
+        # this file
+        warnings.warn("Could not cache {}: {}".format(path, error))
+        for leftover in (cached, cached + '.tmp'):
+            if os.path.exists(leftover):
+                os.remove(leftover)
+        return df
+    _remove_stale(cached, cache_dir)
+    return df
+
+
+def clear_cache(cache_dir=DEFAULT_CACHE_DIR):
+    """Delete every cached file in cache_dir."""
+    if not os.path.isdir(cache_dir):
+        return
+    for name in os.listdir(cache_dir):
+        if name.endswith(FORMATS) or name.endswith('.tmp'):
+            os.remove(os.path.join(cache_dir, name))
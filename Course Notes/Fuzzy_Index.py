@@ -0,0 +1,142 @@
+########################
+# Indexed Fuzzy Matching
+########################
+
+"""
+replace_matches_in_column() in the Data Cleaning notes calls fuzzywuzzy.process.extract(),
+which scores the target string against every unique string in the column. That is fine for
+the 30-odd countries in the professors dataset, but with tens of thousands of unique strings
+and hundreds of targets it means millions of token_sort_ratio() calls, and each one of those
+is slow.
+
+Most of those calls are wasted, because most strings are nowhere near the target. We can tell
+that without scoring them:
+
+- token_sort_ratio() is 100 * 2 * M / (len(a) + len(b)), where M is the number of characters
+the two (cleaned and sorted) strings have in common. M can never be more than the length of
+the shorter string, so two strings with very different lengths can never score highly.
+- M can also never be more than the number of characters the strings share if we just count
+each letter, e.g. "norway" and "south korea" only share o, r and a, so M is at most 3.
+
+FuzzyIndex works out both of these limits for every string at once with numpy and only calls
+token_sort_ratio() on the strings that could possibly reach min_ratio. The strings it skips
+are guaranteed to score below min_ratio, so the results are exactly the same as the
+brute-force version.
+
+countries = professors['Country'].unique()
+index = FuzzyIndex(countries)
+index.extract("south korea", limit=10)
+index.close_matches("south korea", min_ratio=47)
+
+# replace close matches for several targets in one go
+replace_matches_in_column(df=professors, column='Country',
+                          strings_to_match=["south korea", "usa"])
+"""
+
+import heapq
+
+import numpy as np
+from fuzzywuzzy import fuzz, utils
+
+
+def process_and_sort(s):
+    """Return s cleaned and with its words sorted, the way token_sort_ratio() sees it."""
+    return " ".join(sorted(utils.full_process(s, force_ascii=True).split())).strip()
+
+
+class FuzzyIndex:
+    """An index over a list of strings that finds close token_sort_ratio() matches without
+    scoring every string.
+    """
+
+    def __init__(self, strings):
+        # keep the strings in their original order - process.extract() breaks ties by order
+        self.strings = [s for s in strings if isinstance(s, str)]
+        processed = [process_and_sort(s) for s in self.strings]
+
+        # give every character that appears a column number, then count how many times each
+        # character appears in each string (one row per string)
+        self.alphabet = {char: i for i, char in enumerate(sorted(set("".join(processed))))}
+        self.counts = np.zeros((len(processed), len(self.alphabet)), dtype=np.int32)
+        for row, text in enumerate(processed):
+            for char in text:
+                self.counts[row, self.alphabet[char]] += 1
+        self.lengths = self.counts.sum(axis=1)
+
+    def _char_counts(self, text):
+        counts = np.zeros(len(self.alphabet), dtype=np.int32)
+        for char in text:
+            # characters the index has never seen can't be matched by any string
+            if char in self.alphabet:
+                counts[self.alphabet[char]] += 1
+        return counts
+
+    def candidates(self, query, min_ratio):
+        """Return the positions of the strings that could score at least min_ratio against
+        query. Every other string is guaranteed to score less than min_ratio.
+        """
+        if min_ratio <= 0:
+            return np.arange(len(self.strings))
+
+        processed = process_and_sort(query)
+        query_length = len(processed)
+        total_lengths = self.lengths + query_length
+        # fuzzywuzzy rounds the score to a whole number, so a string scoring min_ratio - 0.5
+        # can still end up as min_ratio
+        cutoff = min_ratio - 0.5 - 1e-9
+
+        # limit 1 - the shorter string's length
+        best_by_length = 200.0 * np.minimum(self.lengths, query_length) / np.maximum(total_lengths, 1)
+        positions = np.flatnonzero(best_by_length >= cutoff)
+
+        # limit 2 - the characters the two strings have in common
+        shared = np.minimum(self.counts[positions], self._char_counts(processed)).sum(axis=1)
+        best_by_chars = 200.0 * shared / np.maximum(total_lengths[positions], 1)
+        return positions[best_by_chars >= cutoff]
+
+    def extract(self, query, limit=10, min_ratio=0):
+        """Return the same list of (string, score) pairs as
+        fuzzywuzzy.process.extract(query, strings, limit=limit, scorer=fuzz.token_sort_ratio),
+        leaving out matches that score below min_ratio.
+        """
+        scored = ((self.strings[i], fuzz.token_sort_ratio(query, self.strings[i]))
+                  for i in self.candidates(query, min_ratio))
+        scored = [match for match in scored if match[1] >= min_ratio]
+        if limit is None:
+            return sorted(scored, key=lambda match: match[1], reverse=True)
+        return heapq.nlargest(limit, scored, key=lambda match: match[1])
+
+    def close_matches(self, query, min_ratio=47, limit=10):
+        """Return the strings from the top limit matches that score at least min_ratio."""
+        return [match[0] for match in self.extract(query, limit, min_ratio)]
+
+    def match_many(self, queries, min_ratio=47, limit=10):
+        """Return a dictionary mapping each query to its close_matches()."""
+        return {query: self.close_matches(query, min_ratio, limit) for query in queries}
+
+
+def replace_matches_in_column(df, column, strings_to_match, min_ratio=47, limit=10):
+    """Replace the rows of df[column] that closely match any of strings_to_match with the
+    string they match, like the function in the Data Cleaning notes but for many targets.
+
+    All of the targets are matched against the column as it was before any replacements. If
+    a value is close to more than one target, the target that comes later in the list wins.
+    """
+    if isinstance(strings_to_match, str):
+        strings_to_match = [strings_to_match]
+
+    # build the index once and use it for every target
+    index = FuzzyIndex(df[column].unique())
+    matches = index.match_many(strings_to_match, min_ratio, limit)
+
+    replacements = {}
+    for string_to_match in strings_to_match:
+        for match in matches[string_to_match]:
+            replacements[match] = string_to_match
+
+    # get the rows of all the close matches in our dataframe and replace them
+    rows_with_matches = df[column].isin(list(replacements))
+    df.loc[rows_with_matches, column] = df.loc[rows_with_matches, column].map(replacements)
+
+    # let us know the function's done
+    print("All done!")
@@ -15,6 +15,9 @@ nfl_data = pd.read_csv("../input/nflplaybyplay2009to2016/NFL Play by Play 2009-2
 
 # set seed for reproducibility
 np.random.seed(0) 
+
+Note: If a file is too big to fit in memory (the full NFL file is several GB), it can be
+read in chunks instead - see Chunked_Loading.py.
 """
 
 # STEP 2 - Take a quick look at your imported data
@@ -94,6 +97,9 @@ columns_with_na_dropped.head()
 # Just how much data did we lose?
 print("Columns in original dataset: %d \n" % nfl_data.shape[1])
 print("Columns with na's dropped: %d" % columns_with_na_dropped.shape[1])
+
+Note: Missing_Value_Profiler.py works out the numbers from STEP 3 and STEP 6 (missing counts,
+percent missing, rows and columns left after dropna()) in one pass over the data.
 """
 
 # STEP 7 - Fill in any missing values that you can
@@ -293,6 +299,14 @@ print('\nNormalized data\nPreview:\n', normalized_pledges.head())
 print('Minimum value:', float(normalized_pledges.min()),
       '\nMaximum value:', float(normalized_pledges.max()))
 
+To fit the scaling once (a chunk at a time), save it and reuse it on new rows later, see
+Streaming_Scaling.py:
+
+boxcox = BoxCoxTransformer(['usd_pledged_real'])
+boxcox.update(kickstarters_2017.loc[index_of_positive_pledges])
+boxcox.save('pledged_boxcox.json')
+normalized_pledges = boxcox.transform(kickstarters_2017.loc[index_of_positive_pledges])
+
 """
 
 ###############
@@ -375,6 +389,9 @@ pandas won't always been able to figure out the correct date format, especially
 gotten creative with data entry. The second is that it's much slower than specifying the exact
 format of the dates.
 
+Date_Parsing.py has a parse_dates() function that works out which formats a column uses from
+a sample and then parses each format with an explicit format=, so mixed columns stay fast.
+
 ## Extracting some of the date we want
 
 # get the day of the month from the date_parsed column
@@ -426,6 +443,9 @@ NOTE: !!! - Importantly, if you use the wrong encoding for a set of data then tr
 decode it back to the correct encoding, it is possible, and not uncommon, for data to
 be lost - that is some of the characters will be unrecognizable when they are decoded
 back, making the data unusable!
+
+(For files that mix UTF-8 rows with Windows-1252 rows, and for columns that already have
+mojibake in them, see Mojibake_Repair.py.)
 """
 
 #########################################
@@ -448,6 +468,10 @@ do as Python will automatically save your data as UTF-8:
 
 # save our file (will be saved as UTF-8 by default!)
 kickstarter_2016.to_csv("ks-projects-201801-utf8.csv")
+
+Note: The first 10,000 bytes aren't always enough to guess right, and re-saving through a
+DataFrame reads and writes the whole file twice. Encoding_Detection.py detects the encoding
+from as much of the file as it needs and converts the file to UTF-8 a chunk at a time.
 """
 
 
@@ -468,6 +492,9 @@ professors['Country'] = professors['Country'].str.lower()
 # remove trailing white spaces
 professors['Country'] = professors['Country'].str.strip()
 
+(String_Cleaning.py does both, and collapses double spaces, in one pass over just the
+unique values: professors['Country'] = clean_column(professors['Country']))
+
 
 - In the case of errors like 'southkorea' vs 'south korea' we can use the FuzzyWuzzy package
 to conduct a Fuzzy Match to find values that are close to each other. Here's how it works:
@@ -592,6 +619,10 @@ def replace_matches_in_column(df, column, string_to_match, min_ratio = 47):
 replace_matches_in_column(df=professors, column='Country', string_to_match="south korea")
 countries = professors['Country'].unique()
 
+Note: For columns with lots of unique strings (or lots of targets) this gets slow, because
+every target is scored against every unique string. Fuzzy_Index.py has a version that skips
+strings that can't possibly be close matches and accepts a list of targets.
+
 
 
 
@@ -267,6 +267,9 @@ the scores the wines received to 0. We can do this as follows:
 
 map() returns a new Series where all the values have been transformed by your function.
 
+map() calls the lambda once per row. Map_Accelerator.py rewrites simple lambdas like this one
+as the equivalent NumPy expression (much faster), and uses the normal map() for anything else:
+# fast_map(reviews.points, lambda p: p - review_points_mean)
 
 """
 
@@ -297,6 +300,12 @@ def remean_points(row):
 
 reviews.apply(remean_points, axis='columns')
 
+apply() calls the function on one row at a time, on one core. For big DataFrames and row
+functions that can't be vectorized, Parallel_Apply.py splits the rows between several
+processes (sharing the numeric columns instead of copying them to each process):
+
+parallel_apply(reviews, RemeanPoints(review_points_mean))
+
 Note that map() and apply() return new, transformed Series and DataFrames, respectively.
 They don't modify the original data they're called on. If we look at the first row of reviews,
 we can see that it still has its original points value.
@@ -342,6 +351,11 @@ times each of these two words appears in the description column in the dataset.
 # n_trop = reviews.description.map(lambda desc: "tropical" in desc).sum()
 # n_fruity = reviews.description.map(lambda desc: "fruity" in desc).sum()
 # descriptor_counts = pd.Series([n_trop, n_fruity], index=['tropical', 'fruity'])
+
+Each word here is another pass over every description. Term_Index.py reads the descriptions
+once and then counts any number of words (and pairs of words, or words by country) by lookup:
+
+# descriptor_counts = TermIndex.build(reviews.description).count(['tropical', 'fruity'])
 """
 
 """
@@ -359,7 +373,7 @@ dataset.
 def stars(row):
     if row.country == 'Canada':
         return 3
-    elif row.ponts >= 95:
+    elif row.points >= 95:
         return 3
     elif row.points >= 85:
         return 2
@@ -367,6 +381,12 @@ def stars(row):
         return 1
 
 star_ratings = reviews.apply(stars, axis='columns')
+
+Because stars() is just an ordered list of rules, it can also be run on whole columns at once,
+which is much faster than apply() - see Vectorized_Rules.py:
+
+stars = compile_rules(STAR_RULES, default=1)
+star_ratings = stars(reviews)
 """
 
 
@@ -590,6 +610,13 @@ Primitivo del Tarantino        1
 Name: region_1, Length: 1230, dtype: int64
 
 reviews_per_region = reviews.region_1.fillna('Unknown').value_counts().sort_values(ascending=False)
+
+The same chain can be planned first and run chunk by chunk, reading only the region_1 column
+from the file - see Lazy_Frame.py:
+
+reviews_per_region = (LazyFrame.scan_csv(wine_path, index_col=0)['region_1']
+                      .fillna('Unknown').value_counts().sort_values(ascending=False)
+                      .collect())
 """
 
 ########################
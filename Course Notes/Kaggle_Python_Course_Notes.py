@@ -76,6 +76,9 @@ print(
     sep='\n',
 )
 
+# See Call_Combinators.py for memoized versions of call()/squared_call() (for slow functions
+# called with the same argument again and again) and a max/min that also returns the key.
+
 
 # The Pass keyword literlly does nothing. We can use it to prevent Python from
 # giving us an error when building out a method b/c Python will give an error
@@ -446,6 +449,9 @@ def count_negatives(nums):
 def has_lucky_number(nums):
     return any([num % 7 == 0 for num in nums])
 
+# Note: any() stops at the first True it finds, but only when given a generator - the list above is
+# built in full first. See Batch_Predicates.py for versions of these functions for big NumPy arrays.
+
 # The Monte Carlo Method
 """
 This is a method of determining the average result of some activity or occurance.
@@ -453,6 +459,11 @@ We simulate the event many, many times, then average the outcome of all of the
 simulations to get the average outcome for any given occurance.
 
 This can be used to estimate slot machine earnings, stock market performance, etc.
+
+Blackjack_Simulator.py uses it to find the win rate of blackjack strategies, playing
+millions of games at once with NumPy (and hand_total() from the example code below).
+Monte_Carlo.py runs any simulation like this in parallel, reproducibly from a seed, and can
+stop by itself once the average is accurate enough.
 """
 
 #####################################
@@ -0,0 +1,364 @@
+############
+# Lazy Frame
+############
+
+"""
+Chains of pandas calls like these (from the Pandas and Data Cleaning notes)
+
+reviews.region_1.fillna('Unknown').value_counts().sort_values(ascending=False)
+sf_permits.fillna(method='bfill', axis=0).fillna(0)
+
+run one step at a time, and every step makes a brand new full-size copy of the data, even
+though only the last one is kept. The file also gets read in full first, even when the chain
+only ever looks at one column.
+
+LazyFrame doesn't run anything straight away. It writes each step down (the "plan"), and only
+when collect() is called does it look at the whole plan and run it in a smarter way:
+
+- Projection pushdown: only the columns the plan actually uses are read from the CSV
+(read_csv's usecols=).
+- Filter pushdown: filters are moved to the start of the plan when that doesn't change the
+answer, so rows we don't want are dropped as soon as each chunk is read.
+- Fusion: the row-by-row steps (fillna, replace, astype, rename, filter, bfill) are all run on
+one chunk of the file before moving on to the next, so there is never more than a chunk's
+worth of each intermediate result in memory. bfill() needs values from further down the
+file, so like Chunked_Loading.bfill_chunks() it reads the file (and runs the steps before it)
+twice, rather than holding rows back.
+- value_counts() and groupby().agg() are worked out chunk by chunk too (see
+Streaming_Groupby.py), so the full data never has to be put together at all.
+
+reviews_per_region = (LazyFrame.scan_csv(wine_path, index_col=0)['region_1']
+                      .fillna('Unknown')
+                      .value_counts()
+                      .sort_values(ascending=False))
+print(reviews_per_region.explain())
+result = reviews_per_region.collect()
+print(reviews_per_region.report)     # bytes of intermediate results that were never made
+
+sf_permits_with_na_imputed = LazyFrame.scan_csv(sf_path).bfill().fillna(0).collect()
+
+Steps after a sort_values(), value_counts() or groupby().agg() run on the (much smaller)
+result in the usual pandas way.
+"""
+
+import pandas as pd
+
+from Chunked_Loading import DEFAULT_CHUNKSIZE, bfill_chunk_stream, read_csv_chunks, value_counts_chunks
+from Streaming_Groupby import streaming_groupby
+from Vectorized_Rules import OPERATORS
+
+# steps that can run on one chunk at a time
+ROW_STEPS = ('select', 'filter', 'fillna', 'replace', 'astype', 'rename', 'bfill')
+# steps that need to see all of the rows, but can still be worked out chunk by chunk
+STREAMED_STEPS = ('value_counts', 'groupby_agg')
+
+
+class LazyFrame:
+    """A DataFrame that records operations and only runs them on collect()."""
+
+    def __init__(self, source, source_kwargs=None, steps=(), column=None):
+        # source is either a path to a CSV file or a DataFrame already in memory
+        self.source = source
+        self.source_kwargs = dict(source_kwargs or {})
+        self.steps = list(steps)
+        self.column = column
+        self.report = None
+
+    @classmethod
+    def scan_csv(cls, path, **read_csv_kwargs):
+        """Start a plan that reads the CSV at path (read_csv_kwargs go to pd.read_csv())."""
+        return cls(path, read_csv_kwargs)
+
+    @classmethod
+    def from_frame(cls, df):
+        """Start a plan from a DataFrame that is already in memory."""
+        return cls(df)
+
+    def _then(self, name, *args, column=None):
+        return LazyFrame(self.source, self.source_kwargs, self.steps + [(name, args)],
+                         self.column if column is None else column)
+
+    # recording steps
+
+    def __getitem__(self, columns):
+        """Pick one column (giving a Series at the end) or a list of columns."""
+        if isinstance(columns, str):
+            return self._then('select', [columns], column=columns)
+        return self._then('select', list(columns))
+
+    def select(self, columns):
+        return self[columns]
+
+    def filter(self, column, operator, value):
+        """Keep the rows where df[column] <operator> value, e.g. filter('points', '>=', 90)."""
+        if operator not in OPERATORS:
+            raise ValueError("Unknown operator {!r}".format(operator))
+        return self._then('filter', column, operator, value)
+
+    def fillna(self, value=None, method=None):
+        """Like DataFrame.fillna(). method='bfill' is the same as bfill()."""
+        if method == 'bfill':
+            return self.bfill()
+        if method is not None:
+            raise ValueError("Only method='bfill' is supported")
+        return self._then('fillna', value)
+
+    def bfill(self):
+        return self._then('bfill')
+
+    def replace(self, to_replace, value=None):
+        return self._then('replace', to_replace, value)
+
+    def astype(self, dtype):
+        return self._then('astype', dtype)
+
+    def rename(self, columns):
+        return self._then('rename', dict(columns))
+
+    def value_counts(self):
+        if self.column is None:
+            raise ValueError("value_counts() needs a single column, e.g. lazy['region_1']")
+        return self._then('value_counts')
+
+    def groupby_agg(self, by, column=None, aggs='size'):
+        """The same as df.groupby(by)[column].agg(aggs) (or .size() when column is None)."""
+        return self._then('groupby_agg', by, column, aggs)
+
+    def sort_values(self, *args, **kwargs):
+        return self._then('sort_values', args, kwargs)
+
+    def head(self, n=5):
+        return self._then('head', n)
+
+    # planning
+
+    def _optimized(self):
+        """Return (columns to read, filters to run first, row steps, remaining steps)."""
+        # everything up to the first step that needs all of the rows can run chunk by chunk
+        split = len(self.steps)
+        for position, (name, args) in enumerate(self.steps):
+            if name not in ROW_STEPS:
+                split = position
+                break
+        row_steps, later_steps = self.steps[:split], self.steps[split:]
+
+        # move each filter in front of the steps before it, unless one of them changes the
+        # filtered column (or the rows, like bfill does) - then it has to stay where it is
+        pushed, kept = [], []
+        for name, args in row_steps:
+            if name == 'filter' and all(not _changes(step, args[0]) for step in kept):
+                pushed.append(args)
+            else:
+                kept.append((name, args))
+
+        return self._needed_columns(), pushed, kept, later_steps
+
+    def _needed_columns(self):
+        """Return the columns the plan reads from the source, or None for all of them."""
+        needed = None
+        if self.column is not None:
+            needed = {self.column}
+        # walk the plan backwards, working out which columns each step needs from before it
+        for name, args in reversed(self.steps):
+            if name == 'groupby_agg':
+                by, column, aggs = args
+                needed = set([by] if isinstance(by, str) else by)
+                if column is not None:
+                    needed.add(column)
+            elif name == 'select':
+                needed = set(args[0]) if needed is None else needed & set(args[0])
+            elif name == 'filter' and needed is not None:
+                needed.add(args[0])
+            elif name == 'rename' and needed is not None:
+                old_names = {new: old for old, new in args[0].items()}
+                needed = {old_names.get(column, column) for column in needed}
+        return None if needed is None else sorted(needed)
+
+    def explain(self):
+        """Return the optimized plan as text."""
+        usecols, pushed, row_steps, later_steps = self._optimized()
+        source = self.source if isinstance(self.source, str) else 'DataFrame'
+        lines = ["Scan {} (columns={}, filters={})".format(
+            source, 'all' if usecols is None else usecols, [_describe('filter', f) for f in pushed])]
+        if row_steps:
+            lines.append("  per chunk: " + " -> ".join(_describe(name, args) for name, args in row_steps))
+        for name, args in later_steps:
+            streamed = name in STREAMED_STEPS and later_steps[0][0] == name
+            lines.append("  {}: {}".format('streamed' if streamed else 'on result', _describe(name, args)))
+        return "\n".join(lines)
+
+    # running
+
+    def _chunks(self, usecols, chunksize):
+        if isinstance(self.source, str):
+            kwargs = dict(self.source_kwargs)
+            if usecols is not None:
+                if isinstance(kwargs.get('index_col'), int):
+                    kwargs['index_col'] = _column_name(self.source, kwargs['index_col'], kwargs)
+                kwargs['usecols'] = _with_index_column(usecols, kwargs.get('index_col'))
+            return read_csv_chunks(self.source, chunksize, **kwargs)
+        df = self.source if usecols is None else self.source[usecols]
+        return (df.iloc[start:start + chunksize] for start in range(0, len(df), chunksize))
+
+    def collect(self, chunksize=DEFAULT_CHUNKSIZE):
+        """Run the plan and return the result (a DataFrame, or a Series for one column)."""
+        usecols, pushed, row_steps, later_steps = self._optimized()
+        avoided = {'bytes': 0}
+
+        # each step is a generator over the chunks of the step before it, so every chunk goes
+        # through the whole chain before the next chunk is read
+        def stream_until(n_steps, avoided=None):
+            stream = self._chunks(usecols, chunksize)
+            for column, operator, value in pushed:
+                stream = _run_step_on_chunks(stream, 'filter', (column, operator, value))
+            for i, (name, args) in enumerate(row_steps[:n_steps]):
+                # bfill() reads its input twice, so it gets a way to start it again
+                stream = _run_step_on_chunks(stream, name, args, lambda i=i: stream_until(i))
+                if avoided is not None:
+                    stream = _counted(stream, avoided)
+            return stream
+
+        stream = stream_until(len(row_steps), avoided)
+
+        if later_steps and later_steps[0][0] in STREAMED_STEPS:
+            result = self._aggregate(stream, later_steps[0])
+            later_steps = later_steps[1:]
+        else:
+            parts = list(stream)
+            result = pd.concat(parts) if parts else pd.DataFrame(columns=usecols)
+            # the final result was always going to be made, so it doesn't count as avoided
+            if row_steps:
+                avoided['bytes'] -= int(result.memory_usage(index=True).sum())
+            if self.column is not None:
+                result = result[self.column]
+
+        for name, args in later_steps:
+            result = _run_later_step(result, name, args)
+
+        self.report = {
+            'plan': self.explain(),
+            'columns_read': usecols,
+            'intermediate_bytes_avoided': max(avoided['bytes'], 0),
+        }
+        return result
+
+    def _aggregate(self, stream, step):
+        name, args = step
+        if name == 'value_counts':
+            return value_counts_chunks(stream, self.column)
+        by, column, aggs = args
+        return streaming_groupby(stream, by, column, aggs)
+
+
+def _changes(step, column):
+    """Return whether step could change the values (or rows) that column's filter sees."""
+    name, args = step
+    if name in ('bfill', 'rename'):
+        return True
+    if name in ('fillna', 'astype'):
+        value = args[0]
+        return not isinstance(value, dict) or column in value
+    if name == 'replace':
+        to_replace = args[0]
+        return not isinstance(to_replace, dict) or column in to_replace or \
+            not all(isinstance(v, dict) for v in to_replace.values())
+    return False
+
+
+def _run_row_step(chunk, name, args):
+    if name == 'select':
+        return chunk[args[0]]
+    if name == 'filter':
+        column, operator, value = args
+        return chunk[OPERATORS[operator](chunk[column], value)]
+    if name == 'fillna':
+        return chunk.fillna(args[0])
+    if name == 'replace':
+        to_replace, value = args
+        return chunk.replace(to_replace) if value is None else chunk.replace(to_replace, value)
+    if name == 'astype':
+        return chunk.astype(args[0])
+    if name == 'rename':
+        return chunk.rename(columns=args[0])
+    if name == 'bfill':
+        return chunk.bfill()
+    raise ValueError("Unknown step {!r}".format(name))
+
+
+def _run_later_step(result, name, args):
+    if name == 'sort_values':
+        positional, keywords = args
+        return result.sort_values(*positional, **keywords)
+    if name == 'head':
+        return result.head(args[0])
+    if name == 'value_counts':
+        return result.value_counts()
+    if name == 'groupby_agg':
+        by, column, aggs = args
+        grouped = result.groupby(by)
+        return grouped.size() if column is None else grouped[column].agg(aggs)
+    return _run_row_step(result, name, args)
+
+
+def _run_step_on_chunks(chunks, name, args, restart=None):
+    if name == 'bfill':
+        yield from _bfill_chunks(chunks, restart)
+        return
+    for chunk in chunks:
+        yield _run_row_step(chunk, name, args)
+
+
+def _bfill_chunks(chunks, restart):
+    """bfill() a stream of chunks, giving the same values as bfill() on all of them at once.
+
+    This is Chunked_Loading.bfill_chunk_stream(), which reads its chunks twice: restart()
+    makes the first pass (which only keeps the first non-missing value of each column per
+    chunk), and the second pass fills chunks from those.
+    """
+    passes = iter([restart(), chunks])
+    # a single column is backfilled as a one column DataFrame, and given back as a Series
+    series = {}
+
+    def frames(stream):
+        for chunk in stream:
+            if isinstance(chunk, pd.Series):
+                series['name'] = chunk.name
+                chunk = chunk.to_frame()
+            yield chunk
+
+    for chunk in bfill_chunk_stream(lambda: frames(next(passes))):
+        yield chunk.iloc[:, 0].rename(series['name']) if series else chunk
+
+
+def _counted(chunks, avoided):
+    # run one step at a time on the whole DataFrame, this step would have made a full copy
+    for chunk in chunks:
+        avoided['bytes'] += int(chunk.memory_usage(index=True).sum())
+        yield chunk
+
+
+def _column_name(path, number, read_csv_kwargs):
+    """Return the name of column number (counting from 0) in the CSV file's header."""
+    # with usecols=, read_csv() counts index_col among the columns it reads, not the file's
+    # columns, so a column number has to become a name first
+    kwargs = {key: value for key, value in read_csv_kwargs.items() if key not in ('usecols', 'index_col')}
+    return pd.read_csv(path, nrows=0, **kwargs).columns[number]
+
+
+def _with_index_column(usecols, index_col):
+    """Make sure the index column is read too."""
+    if isinstance(index_col, str) and index_col not in usecols:
+        return list(usecols) + [index_col]
+    return usecols
+
+
+def _describe(name, args):
+    if name == 'filter':
+        return "filter({!r} {} {!r})".format(*args)
+    if name == 'bfill':
+        return "bfill()"
+    if name == 'sort_values':
+        positional, keywords = args
+        parts = [repr(a) for a in positional] + ['{}={!r}'.format(k, v) for k, v in keywords.items()]
+        return "sort_values({})".format(", ".join(parts))
+    return "{}({})".format(name, ", ".join(repr(a) for a in args))
@@ -0,0 +1,451 @@
+#################
+# Map Accelerator
+#################
+
+"""
+The Maps section remeans the points with a lambda:
+
+reviews.points.map(lambda p: p - review_points_mean)
+
+and then shows the faster, built-in way of doing the same thing:
+
+reviews.points - review_points_mean
+
+map() calls the lambda once for every row, in Python. The second version does the subtraction
+for the whole column at once, in NumPy's compiled code. But the lambda is the way people think
+of it, so it keeps getting written.
+
+fast_map() reads the lambda's source code (with the ast module), and if the lambda is simple
+enough it rewrites it as the NumPy version and runs that on the whole column instead:
+
+fast_map(reviews.points, lambda p: p - review_points_mean)
+explain(lambda p: p - review_points_mean)     # 'np.subtract(p, review_points_mean)'
+
+What can be rewritten: + - * / // % **, comparisons (p > 90, 80 <= p < 90), and/or/not of
+comparisons, x if condition else y, abs() and NumPy functions like np.sqrt() and np.log(), with
+numbers written in the lambda or taken from variables (like review_points_mean above). The
+variables are looked up again on every call, so the answer is the same as map() would give
+even if review_points_mean has changed since.
+
+Anything else (strings, other function calls, missing source code, a column that isn't plain
+numbers, or a NumPy warning such as dividing by zero) is handed to the normal series.map(fn),
+so the result never changes - only the speed. fast_map.stats() gives the hit rate (how many
+calls were rewritten) and the reasons for the rest, and fast_map.log_stats() logs them with the
+logging module.
+
+NumPy integers have a fixed size and wrap around when they get too big (in uint8, 80 - 88 is
+248), Python's don't. So whole-number columns are worked out in int64 and floats in float64,
+like map() hands the function Python ints and floats. The calculation is also done in floats
+first, and if any step of it (not just the answer) could wrap around in int64, map() is used
+instead. check_against_map() compares the two on small columns.
+"""
+
+import ast
+import builtins
+import inspect
+import logging
+import textwrap
+import time
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+BINARY_OPERATORS = {
+    ast.Add: 'np.add',
+    ast.Sub: 'np.subtract',
+    ast.Mult: 'np.multiply',
+    ast.Div: 'np.true_divide',
+    ast.FloorDiv: 'np.floor_divide',
+    # np.mod gives the remainder the sign of the divisor, like Python's %
+    ast.Mod: 'np.mod',
+    ast.Pow: 'np.power',
+}
+UNARY_OPERATORS = {
+    ast.USub: 'np.negative',
+    ast.UAdd: 'np.positive',
+    ast.Not: 'np.logical_not',
+}
+COMPARISONS = {
+    ast.Lt: 'np.less',
+    ast.LtE: 'np.less_equal',
+    ast.Gt: 'np.greater',
+    ast.GtE: 'np.greater_equal',
+    ast.Eq: 'np.equal',
+    ast.NotEq: 'np.not_equal',
+}
+BOOLEAN_OPERATORS = {
+    ast.And: 'np.logical_and',
+    ast.Or: 'np.logical_or',
+}
+# NumPy functions that work on one number the same way they work on a whole array
+NUMPY_FUNCTIONS = {'abs', 'absolute', 'sqrt', 'cbrt', 'square', 'exp', 'exp2', 'expm1', 'log',
+                   'log2', 'log10', 'log1p', 'floor', 'ceil', 'trunc', 'rint', 'sign', 'sin',
+                   'cos', 'tan', 'arcsin', 'arccos', 'arctan', 'sinh', 'cosh', 'tanh'}
+NUMBER_TYPES = (bool, int, float, np.bool_, np.integer, np.floating)
+# int64 goes up to about 9.2 * 10**18. Anything worked out in floats to be below this is well
+# inside that, even with the rounding floats do
+INT64_SAFE_LIMIT = 2.0 ** 62
+
+
+class Untranslatable(Exception):
+    """The function can't be rewritten as NumPy - the message says why."""
+
+
+class _Translation:
+    """A function rewritten as one NumPy expression of its argument."""
+
+    def __init__(self, argument, source, names, functions):
+        self.argument = argument
+        self.source = source
+        # the variables the expression reads, and which of them are called as functions
+        self.names = names
+        self.functions = functions
+        self.code = compile(source, '<map accelerator>', 'eval')
+        # the same expression with every step wrapped in _checked(...), for checking that
+        # no step on the way to the answer gets too big for int64
+        checked = _CheckEveryStep().visit(ast.parse(source, mode='eval'))
+        self.checked_code = compile(ast.fix_missing_locations(checked), '<map accelerator>', 'eval')
+
+
+class _CheckEveryStep(ast.NodeTransformer):
+    def visit_Call(self, node):
+        self.generic_visit(node)
+        return ast.Call(func=ast.Name(id='_checked', ctx=ast.Load()), args=[node], keywords=[])
+
+
+def _checked(values):
+    if np.abs(np.asarray(values, dtype=np.float64)).max(initial=0) >= INT64_SAFE_LIMIT:
+        raise Untranslatable("a step of the calculation is too big for int64")
+    return values
+
+
+def _find_function_node(fn):
+    try:
+        raw_source = inspect.getsource(fn)
+    except (OSError, TypeError):
+        raise Untranslatable("the source code isn't available")
+    source = textwrap.dedent(raw_source)
+    try:
+        tree = ast.parse(source)
+    except SyntaxError:
+        # a lambda in the middle of a statement that goes over several lines
+        raise Untranslatable("the source code couldn't be parsed on its own")
+
+    if fn.__name__ != '<lambda>':
+        for node in ast.walk(tree):
+            if isinstance(node, ast.FunctionDef) and node.name == fn.__name__:
+                if len(node.body) != 1 or not isinstance(node.body[0], ast.Return) \
+                        or node.body[0].value is None:
+                    raise Untranslatable("the function is more than a single return")
+                return node.args, node.body[0].value
+        raise Untranslatable("the function wasn't found in its source code")
+
+    # the source is the whole line(s), which can hold more than one lambda. Keep the ones that
+    # use the same names as fn
+    used = set(fn.__code__.co_names) | set(fn.__code__.co_freevars) | set(fn.__code__.co_varnames)
+    candidates = []
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Lambda):
+            names = {child.id for child in ast.walk(node.body) if isinstance(child, ast.Name)}
+            names |= {child.attr for child in ast.walk(node.body) if isinstance(child, ast.Attribute)}
+            names |= {argument.arg for argument in node.args.args}
+            if names == used:
+                candidates.append(node)
+    if len(candidates) > 1:
+        # tell them apart by where they are: every instruction of fn remembers the line and
+        # column of the code it came from, so one of them starts where the right body starts
+        code = fn.__code__
+        indent = len(raw_source.splitlines()[0]) - len(source.splitlines()[0])
+        starts = {(line, column) for line, _, column, _ in code.co_positions()}
+        candidates = [node for node in candidates
+                      if (node.body.lineno + code.co_firstlineno - 1, node.body.col_offset + indent) in starts]
+    if len(candidates) != 1:
+        raise Untranslatable("couldn't tell which lambda on the line it is")
+    return candidates[0].args, candidates[0].body
+
+
+class _Translator:
+    """Turns the body of a one-argument function into the source of a NumPy expression."""
+
+    def __init__(self, argument):
+        self.argument = argument
+        self.names = set()
+        self.functions = set()
+
+    def translate(self, node):
+        method = getattr(self, '_' + type(node).__name__, None)
+        if method is None:
+            raise Untranslatable("{} isn't supported".format(type(node).__name__))
+        return method(node)
+
+    def _Constant(self, node):
+        if not isinstance(node.value, NUMBER_TYPES):
+            raise Untranslatable("{!r} isn't a number".format(node.value))
+        return repr(node.value)
+
+    def _Name(self, node):
+        if node.id == 'np':
+            # the name the expression uses for NumPy itself
+            raise Untranslatable("np is only supported as NumPy")
+        if node.id != self.argument:
+            self.names.add(node.id)
+        return node.id
+
+    def _BinOp(self, node):
+        operator = BINARY_OPERATORS.get(type(node.op))
+        if operator is None:
+            raise Untranslatable("the {} operator isn't supported".format(type(node.op).__name__))
+        return '{}({}, {})'.format(operator, self.translate(node.left), self.translate(node.right))
+
+    def _UnaryOp(self, node):
+        operator = UNARY_OPERATORS.get(type(node.op))
+        if operator is None:
+            raise Untranslatable("the {} operator isn't supported".format(type(node.op).__name__))
+        return '{}({})'.format(operator, self.translate(node.operand))
+
+    def _Compare(self, node):
+        # 80 <= p < 90 means (80 <= p) and (p < 90)
+        parts = []
+        left = self.translate(node.left)
+        for op, comparator in zip(node.ops, node.comparators):
+            comparison = COMPARISONS.get(type(op))
+            if comparison is None:
+                raise Untranslatable("the {} comparison isn't supported".format(type(op).__name__))
+            right = self.translate(comparator)
+            parts.append('{}({}, {})'.format(comparison, left, right))
+            left = right
+        return self._join('np.logical_and', parts)
+
+    def _BoolOp(self, node):
+        # `a and b` gives back a or b itself, not True/False, so it only matches
+        # np.logical_and when both sides already are True/False
+        for value in node.values:
+            if not (isinstance(value, (ast.Compare, ast.BoolOp)) or
+                    (isinstance(value, ast.UnaryOp) and isinstance(value.op, ast.Not))):
+                raise Untranslatable("and/or is only supported between comparisons")
+        return self._join(BOOLEAN_OPERATORS[type(node.op)], [self.translate(value) for value in node.values])
+
+    def _IfExp(self, node):
+        return 'np.where({}, {}, {})'.format(self.translate(node.test), self.translate(node.body),
+                                             self.translate(node.orelse))
+
+    def _Call(self, node):
+        if len(node.args) != 1 or node.keywords or isinstance(node.args[0], ast.Starred):
+            raise Untranslatable("only functions of one argument are supported")
+        function = node.func
+        if isinstance(function, ast.Name) and function.id == 'abs':
+            self.names.add('abs')
+            self.functions.add('abs')
+            return 'np.abs({})'.format(self.translate(node.args[0]))
+        if isinstance(function, ast.Attribute) and isinstance(function.value, ast.Name) \
+                and function.attr in NUMPY_FUNCTIONS:
+            # checked to really be NumPy when the variables are looked up
+            self.names.add(function.value.id)
+            self.functions.add(function.value.id)
+            return 'np.{}({})'.format(function.attr, self.translate(node.args[0]))
+        raise Untranslatable("the function {} isn't supported".format(ast.unparse(function)))
+
+    @staticmethod
+    def _join(function, parts):
+        joined = parts[0]
+        for part in parts[1:]:
+            joined = '{}({}, {})'.format(function, joined, part)
+        return joined
+
+
+def translate(fn):
+    """Rewrite fn (a function of one argument) as NumPy, or raise Untranslatable."""
+    arguments, body = _find_function_node(fn)
+    if len(arguments.args) != 1 or arguments.posonlyargs or arguments.kwonlyargs or \
+            arguments.vararg or arguments.kwarg or arguments.defaults:
+        raise Untranslatable("the function doesn't take exactly one argument")
+    argument = arguments.args[0].arg
+    translator = _Translator(argument)
+    source = translator.translate(body)
+    return _Translation(argument, source, translator.names, translator.functions)
+
+
+def explain(fn):
+    """Return the NumPy expression fn is rewritten as, or why it can't be."""
+    try:
+        return translate(fn).source
+    except Untranslatable as reason:
+        return "not rewritten: {}".format(reason)
+
+
+def _lookup(fn, name):
+    # the way Python looks up a name inside fn: its closure, then globals, then builtins
+    code = fn.__code__
+    if name in code.co_freevars and fn.__closure__ is not None:
+        try:
+            return fn.__closure__[code.co_freevars.index(name)].cell_contents
+        except ValueError:
+            raise Untranslatable("{} isn't set yet".format(name))
+    if name in fn.__globals__:
+        return fn.__globals__[name]
+    if hasattr(builtins, name):
+        return getattr(builtins, name)
+    raise Untranslatable("{} isn't defined".format(name))
+
+
+def _namespace(fn, translation):
+    """Look up the variables the expression uses, as they are right now."""
+    namespace = {'np': np}
+    for name in translation.names:
+        value = _lookup(fn, name)
+        if name in translation.functions:
+            expected = builtins.abs if name == 'abs' else np
+            if value is not expected:
+                raise Untranslatable("{} isn't {}".format(name, 'abs()' if name == 'abs' else 'NumPy'))
+            continue
+        if not isinstance(value, NUMBER_TYPES):
+            raise Untranslatable("{} isn't a number".format(name))
+        namespace[name] = value
+    return namespace
+
+
+class MapAccelerator:
+    """series.map(fn) that runs simple arithmetic/comparison functions as NumPy instead."""
+
+    def __init__(self):
+        # code object -> _Translation, or the reason it can't be translated
+        self.translations = {}
+        self.hits = 0
+        self.misses = 0
+        self.reasons = Counter()
+
+    def _translation(self, fn):
+        code = getattr(fn, '__code__', None)
+        if code is None:
+            raise Untranslatable("it isn't a Python function")
+        if code not in self.translations:
+            try:
+                self.translations[code] = translate(fn)
+            except Untranslatable as reason:
+                self.translations[code] = str(reason)
+        translation = self.translations[code]
+        if isinstance(translation, str):
+            raise Untranslatable(translation)
+        return translation
+
+    def _vectorized(self, series, fn):
+        dtype = series.dtype
+        if not isinstance(dtype, np.dtype) or dtype.kind not in 'iuf' or dtype == np.uint64:
+            raise Untranslatable("the column's dtype is {}, not plain numbers".format(dtype))
+        translation = self._translation(fn)
+        namespace = _namespace(fn, translation)
+        # map() hands the function Python ints and floats, so work in the NumPy types closest
+        # to those. In uint8, 80 - 88 would wrap around to 248
+        values = series.to_numpy(dtype=np.int64 if dtype.kind in 'iu' else np.float64)
+        try:
+            # a warning means a value where NumPy and Python differ (1 / 0 raises in Python),
+            # so let map() handle it
+            with np.errstate(all='raise'):
+                if values.dtype.kind == 'i':
+                    # integers wrap around silently, in the middle of the calculation too
+                    # (p * big // big). Work it out in floats first, where they can't, and
+                    # check every step stays well inside the int64 range
+                    self._evaluate(translation, namespace, values.astype(np.float64), checked=True)
+                result = np.asarray(self._evaluate(translation, namespace, values))
+        except (FloatingPointError, OverflowError, TypeError, ValueError) as error:
+            raise Untranslatable("NumPy raised {}".format(type(error).__name__))
+        if result.shape != values.shape:
+            # the function doesn't use its argument (lambda p: 0)
+            result = np.full(values.shape, result)
+        return pd.Series(result, index=series.index, name=series.name)
+
+    @staticmethod
+    def _evaluate(translation, namespace, values, checked=False):
+        namespace = dict(namespace, **{translation.argument: values})
+        if checked:
+            namespace['_checked'] = _checked
+            return eval(translation.checked_code, namespace)
+        return eval(translation.code, namespace)
+
+    def __call__(self, series, fn):
+        """Return series.map(fn), as NumPy when fn can be rewritten."""
+        try:
+            result = self._vectorized(series, fn)
+        except Untranslatable as reason:
+            self.misses += 1
+            self.reasons[str(reason)] += 1
+            logger.debug("map(%s) not rewritten: %s", getattr(fn, '__name__', fn), reason)
+            return series.map(fn)
+        self.hits += 1
+        return result
+
+    def stats(self):
+        calls = self.hits + self.misses
+        return {'hits': self.hits, 'misses': self.misses,
+                'hit_rate': self.hits / calls if calls else 0.0, 'reasons': dict(self.reasons)}
+
+    def log_stats(self, level=logging.INFO):
+        stats = self.stats()
+        logger.log(level, "fast_map rewrote %d of %d calls (hit rate %.0f%%)", stats['hits'],
+                   stats['hits'] + stats['misses'], 100 * stats['hit_rate'])
+        for reason, count in self.reasons.most_common():
+            logger.log(level, "  %d not rewritten: %s", count, reason)
+
+
+fast_map = MapAccelerator()
+
+
+def benchmark(n_rows=1000000, seed=0):
+    """Time reviews.points.map(lambda p: p - review_points_mean) against fast_map()."""
+    rng = np.random.default_rng(seed)
+    points = pd.Series(rng.integers(80, 101, n_rows), name='points')
+    review_points_mean = points.mean()
+
+    start = time.perf_counter()
+    expected = points.map(lambda p: p - review_points_mean)
+    map_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    result = fast_map(points, lambda p: p - review_points_mean)
+    fast_seconds = time.perf_counter() - start
+
+    pd.testing.assert_series_equal(result, expected)
+    print("Rows: {:,}".format(n_rows))
+    print("map(lambda p: p - review_points_mean):      {:.3f}s".format(map_seconds))
+    print("fast_map(points, lambda ...):               {:.3f}s".format(fast_seconds))
+    print("Speedup: {:,.0f}x".format(map_seconds / fast_seconds))
+    print("Rewritten as:", explain(lambda p: p - review_points_mean))
+    return map_seconds, fast_seconds
+
+
+def check_against_map():
+    """Check fast_map() gives exactly what map() does, including for small integer types."""
+    review_points_mean = 88
+    big = 10 ** 17
+    columns = [pd.Series([80, 88, 95, 100], dtype=dtype, name='points')
+               for dtype in ['uint8', 'int8', 'int16', 'int64', 'float32', 'float64']]
+    # one lambda per line, so each one's source can be found
+    functions = [
+        lambda p: p - review_points_mean,
+        lambda p: p * 3,
+        lambda p: -p,
+        lambda p: p ** 2,
+        lambda p: p // 7 - p % 7,
+        lambda p: p / 3,
+        lambda p: p > review_points_mean,
+        lambda p: p * big,
+        lambda p: 1 if p > 90 else 0,
+        # too big for int64 on the way, but not at the end
+        lambda p: p * big // big,
+        lambda p: (p * big) % 1000,
+        lambda p: p * big * 0,
+        lambda p: p * big > 0,
+    ]
+    for column in columns:
+        for fn in functions:
+            pd.testing.assert_series_equal(fast_map(column, fn), column.map(fn))
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    check_against_map()
+    benchmark()
+    fast_map.log_stats()
@@ -0,0 +1,146 @@
+########################
+# Missing Value Profiler
+########################
+
+"""
+STEP 3 and STEP 6 of Handling Missing Values look at the missing data several times over:
+
+missing_values_count = nfl_data.isnull().sum()
+total_cells = np.product(nfl_data.shape)
+nfl_data.dropna()
+nfl_data.dropna(axis=1)
+
+Each line goes through the whole DataFrame again, and the first one builds a True/False mask
+the size of the entire dataset. MissingValueProfile works all of these numbers out in a single
+pass, one chunk at a time, so it works on the full NFL file without loading it:
+
+profile = profile_csv("../input/nflplaybyplay2009to2016/NFL Play by Play 2009-2017 (v4).csv")
+profile.missing_values_count        # the same as nfl_data.isnull().sum()
+profile.percent_missing             # percent of all cells that are missing
+profile.rows_after_dropna           # the same as nfl_data.dropna().shape[0]
+profile.columns_after_dropna        # the same as list(nfl_data.dropna(axis=1).columns)
+profile.co_occurrence()             # how often each pair of columns is missing together
+profile.top_patterns(10)            # the most common combinations of missing columns
+print(profile.summary())
+"""
+
+import numpy as np
+import pandas as pd
+
+from Chunked_Loading import DEFAULT_CHUNKSIZE, read_csv_chunks
+
+
+class MissingValueProfile:
+    """Running totals of the missing values in a DataFrame that is seen one chunk at a time."""
+
+    def __init__(self):
+        self.columns = None
+        self.total_rows = 0
+        self.null_counts = None
+        self.complete_rows = 0
+        self.pair_counts = None
+        self.patterns = {}
+
+    def update(self, chunk):
+        """Add the missing values in chunk (a DataFrame) to the totals."""
+        if self.columns is None:
+            self.columns = list(chunk.columns)
+            self.null_counts = np.zeros(len(self.columns), dtype=np.int64)
+            self.pair_counts = np.zeros((len(self.columns), len(self.columns)), dtype=np.int64)
+        elif list(chunk.columns) != self.columns:
+            raise ValueError("Every chunk must have the same columns")
+
+        # the mask is only ever as big as one chunk
+        mask = chunk.isnull().to_numpy()
+        self.total_rows += len(mask)
+        self.null_counts += mask.sum(axis=0)
+        self.complete_rows += int((~mask.any(axis=1)).sum())
+
+        # (i, j) counts the rows where both column i and column j are missing
+        as_ints = mask.astype(np.int32)
+        self.pair_counts += as_ints.T @ as_ints
+
+        # pack each row's mask into bytes, so rows with the same missing columns can be counted
+        packed = np.packbits(mask, axis=1)
+        if len(packed):
+            rows, counts = np.unique(packed, axis=0, return_counts=True)
+            for row, count in zip(rows, counts):
+                key = row.tobytes()
+                self.patterns[key] = self.patterns.get(key, 0) + int(count)
+        return self
+
+    @property
+    def missing_values_count(self):
+        return pd.Series(self.null_counts, index=self.columns, dtype='int64')
+
+    @property
+    def total_cells(self):
+        return self.total_rows * len(self.columns)
+
+    @property
+    def total_missing(self):
+        return int(self.null_counts.sum())
+
+    @property
+    def percent_missing(self):
+        if self.total_cells == 0:
+            return 0.0
+        return (self.total_missing / self.total_cells) * 100
+
+    @property
+    def rows_after_dropna(self):
+        """The number of rows left after dropna() (rows with no missing values)."""
+        return self.complete_rows
+
+    @property
+    def columns_after_dropna(self):
+        """The columns left after dropna(axis=1) (columns with no missing values)."""
+        return [column for column, count in zip(self.columns, self.null_counts) if count == 0]
+
+    def co_occurrence(self):
+        """Return a DataFrame counting the rows where each pair of columns is missing at the
+        same time. The diagonal is the same as missing_values_count.
+        """
+        return pd.DataFrame(self.pair_counts, index=self.columns, columns=self.columns)
+
+    def top_patterns(self, n=10):
+        """Return the n most common sets of missing columns, as a Series whose index is a
+        tuple of column names and whose values are the number of rows with that pattern.
+        """
+        top = sorted(self.patterns.items(), key=lambda item: -item[1])[:n]
+        index, counts = [], []
+        for key, count in top:
+            bits = np.unpackbits(np.frombuffer(key, dtype=np.uint8))[:len(self.columns)]
+            index.append(tuple(column for column, bit in zip(self.columns, bits) if bit))
+            counts.append(count)
+        return pd.Series(counts, index=index, name='rows', dtype='int64')
+
+    def summary(self):
+        """Return a short text report of the profile."""
+        lines = [
+            "Rows: {:,}  Columns: {:,}".format(self.total_rows, len(self.columns)),
+            "Missing cells: {:,} of {:,} ({:.2f}%)".format(self.total_missing, self.total_cells,
+                                                         self.percent_missing),
+            "Rows left after dropna(): {:,}".format(self.rows_after_dropna),
+            "Columns left after dropna(axis=1): {:,}".format(len(self.columns_after_dropna)),
+            "Different missing-value patterns: {:,}".format(len(self.patterns)),
+        ]
+        return "\n".join(lines)
+
+
+def profile_chunks(chunks):
+    """Return a MissingValueProfile built from a stream of DataFrame chunks."""
+    profile = MissingValueProfile()
+    for chunk in chunks:
+        profile.update(chunk)
+    return profile
+
+
+def profile_csv(path, chunksize=DEFAULT_CHUNKSIZE, **read_csv_kwargs):
+    """Return a MissingValueProfile of the CSV file at path, read one chunk at a time."""
+    return profile_chunks(read_csv_chunks(path, chunksize, **read_csv_kwargs))
+
+
+def profile_frame(df, chunksize=DEFAULT_CHUNKSIZE):
+    """Return a MissingValueProfile of a DataFrame that is already in memory."""
+    return profile_chunks(df.iloc[start:start + chunksize] for start in range(0, len(df), chunksize))
@@ -0,0 +1,198 @@
+#################
+# Mojibake Repair
+#################
+
+"""
+The Character Encodings section warns that reading text with the wrong encoding gives
+"mojibake" - gibberish like "CafÃ© Ã  la carte" instead of "Café à la carte". That example
+is what UTF-8 text looks like when it is read as Windows-1252 (cp1252): every accented letter
+is two bytes in UTF-8, and cp1252 shows each byte as its own character.
+
+Some files are worse than wrong - they are *mixed*. Rows typed on one machine are UTF-8 and
+rows from another are cp1252 (or latin-1), so no single encoding reads the whole file. There
+are two places to fix that:
+
+1. While reading the file (the best place - nothing has been lost yet). repair_file() and
+read_csv_mixed() decode the file as UTF-8, and every byte that isn't valid UTF-8 is decoded as
+cp1252 instead. Python does the UTF-8 decoding in C over big blocks of bytes and only calls
+our fallback for the bad bytes, so it runs about as fast as a normal read:
+
+kickstarters = read_csv_mixed("../input/kickstarter-projects/ks-projects-201612.csv")
+
+2. After the file was read with the wrong encoding, on the text column itself.
+repair_column() looks for the tell-tale pairs of characters mojibake makes ("Ã©", "â€™"),
+turns those values back into the bytes they came from and decodes them properly. Only the
+different values are checked, not every row:
+
+names, report = repair_column(kickstarters['name'])
+report      # {'values': ..., 'suspect': ..., 'changed': ..., 'lost': ...}
+
+"lost" counts the values with the unknown character (U+FFFD, the question mark in a diamond)
+in them - those characters were thrown away when the text was first decoded, and nothing can
+bring them back.
+"""
+
+import codecs
+import io
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+from Encoding_Detection import DEFAULT_CHUNK_SIZE, _read_chunks
+
+FALLBACK_ERRORS = 'cp1252_fallback'
+REPLACEMENT_CHARACTER = '\ufffd'
+
+# the 5 bytes cp1252 doesn't use are read the way latin-1 reads them
+_BYTE_TO_CHARACTER = []
+for _byte in range(256):
+    try:
+        _BYTE_TO_CHARACTER.append(bytes([_byte]).decode('cp1252'))
+    except UnicodeDecodeError:
+        _BYTE_TO_CHARACTER.append(bytes([_byte]).decode('latin-1'))
+_CHARACTER_TO_BYTE = {character: byte for byte, character in enumerate(_BYTE_TO_CHARACTER)}
+
+# UTF-8 writes every non-ASCII character as a lead byte (0xC2-0xF4) and then one or more
+# continuation bytes (0x80-0xBF). Read as cp1252, those become one of these pairs
+MOJIBAKE = re.compile('[{}][{}]'.format(
+    re.escape(''.join(_BYTE_TO_CHARACTER[0xC2:0xF5])),
+    re.escape(''.join(_BYTE_TO_CHARACTER[0x80:0xC0]))))
+
+
+class _FallbackCounts:
+    """How many bytes the fallback decoded as cp1252, for the report."""
+    bytes = 0
+
+
+def _cp1252_fallback(error):
+    # called by bytes.decode() with the bytes that aren't valid UTF-8
+    if not isinstance(error, UnicodeDecodeError):
+        raise error
+    bad = error.object[error.start:error.end]
+    _FallbackCounts.bytes += len(bad)
+    return ''.join(_BYTE_TO_CHARACTER[byte] for byte in bad), error.end
+
+
+codecs.register_error(FALLBACK_ERRORS, _cp1252_fallback)
+
+
+def decode_mixed(data):
+    """Decode bytes that are mostly UTF-8, reading any invalid bytes as cp1252."""
+    return data.decode('utf-8', errors=FALLBACK_ERRORS)
+
+
+def _decode_file(path, chunk_size):
+    # an incremental decoder doesn't mistake a character cut in half at the end of a chunk
+    # for a bad byte - it waits for the rest of it in the next chunk
+    decoder = codecs.getincrementaldecoder('utf-8')(errors=FALLBACK_ERRORS)
+    with open(path, 'rb') as file:
+        for chunk in _read_chunks(file, chunk_size):
+            yield decoder.decode(chunk)
+    yield decoder.decode(b'', final=True)
+
+
+def repair_file(source, destination, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Copy source to destination as clean UTF-8, one chunk at a time.
+
+    Returns a report of the bytes read and how many of them were decoded as cp1252.
+    """
+    _FallbackCounts.bytes = 0
+    temporary = destination + '.tmp'
+    with open(temporary, 'w', encoding='utf-8', newline='') as outfile:
+        for text in _decode_file(source, chunk_size):
+            outfile.write(text)
+    os.replace(temporary, destination)
+    return {'bytes': os.path.getsize(source), 'cp1252_bytes': _FallbackCounts.bytes}
+
+
+class _ChunkStream(io.RawIOBase):
+    """A read-only binary file whose contents come from a generator of bytes objects."""
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.chunk = memoryview(b'')
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while not self.chunk:
+            try:
+                self.chunk = memoryview(next(self.chunks))
+            except StopIteration:
+                return 0
+        size = min(len(buffer), len(self.chunk))
+        buffer[:size] = self.chunk[:size]
+        self.chunk = self.chunk[size:]
+        return size
+
+
+def read_csv_mixed(path, chunk_size=DEFAULT_CHUNK_SIZE, **read_csv_kwargs):
+    """Return pd.read_csv() of a file of mixed UTF-8 and cp1252 rows."""
+    # read_csv() reads the clean UTF-8 a chunk at a time as it is decoded, so only the
+    # DataFrame is ever in memory in full, not the text of the file as well
+    utf8_chunks = (text.encode('utf-8') for text in _decode_file(path, chunk_size))
+    with io.BufferedReader(_ChunkStream(utf8_chunks)) as file:
+        return pd.read_csv(file, **read_csv_kwargs)
+
+
+def _to_original_bytes(value):
+    # the bytes the text was read from, assuming it was read as cp1252
+    try:
+        return bytes(_CHARACTER_TO_BYTE[character] for character in value)
+    except KeyError:
+        # a character cp1252 can't make, so this text can't have come from cp1252
+        return None
+
+
+def repair_text(value, max_rounds=2):
+    """Undo UTF-8-read-as-cp1252 mojibake in one string, or return it unchanged.
+
+    Text that went wrong twice ("Ã©" read as cp1252 again) is fixed one round at a time.
+    """
+    for _ in range(max_rounds):
+        if not MOJIBAKE.search(value):
+            break
+        original = _to_original_bytes(value)
+        if original is None:
+            break
+        try:
+            value = original.decode('utf-8')
+        except UnicodeDecodeError:
+            # not valid UTF-8 underneath, so it wasn't mojibake after all
+            break
+    return value
+
+
+def repair_column(column):
+    """Return (column with its mojibake repaired, report).
+
+    Each different value is only checked once. The report counts the non-missing values,
+    the ones that looked like mojibake ('suspect'), the ones that were changed and the ones
+    with characters that are lost for good.
+    """
+    codes, uniques = pd.factorize(column)
+    uniques = np.asarray(uniques, dtype=object)
+    counts = np.bincount(codes[codes >= 0], minlength=len(uniques))
+
+    is_text = np.array([isinstance(value, str) for value in uniques], dtype=bool)
+    suspect = np.array([bool(is_text[i] and MOJIBAKE.search(value)) for i, value in enumerate(uniques)],
+                       dtype=bool)
+    repaired = uniques.copy()
+    for i in np.flatnonzero(suspect):
+        repaired[i] = repair_text(uniques[i])
+    changed = repaired != uniques
+    lost = np.array([bool(is_text[i] and REPLACEMENT_CHARACTER in value) for i, value in enumerate(repaired)],
+                    dtype=bool)
+
+    report = {'values': int(counts.sum()), 'suspect': int(counts[suspect].sum()),
+              'changed': int(counts[changed].sum()), 'lost': int(counts[lost].sum())}
+    if not changed.any():
+        return column, report
+    values = np.r_[repaired, np.nan][codes]
+    result = pd.Series(values, index=column.index, name=column.name, dtype=object)
+    if isinstance(column.dtype, pd.StringDtype):
+        result = result.astype(column.dtype)
+    return result, report
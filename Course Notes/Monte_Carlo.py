@@ -0,0 +1,185 @@
+#############
+# Monte Carlo
+#############
+
+"""
+The Python notes describe the Monte Carlo method (simulate something many, many times and
+average the results), and the Data Cleaning notes start with
+
+np.random.seed(0)
+
+"for reproducibility". np.random.seed() sets one random number generator shared by the whole
+program, so the numbers a simulation gets depend on everything else that used the generator
+before it, and it can't be shared between processes - two processes started from the same
+seed just make the same "random" numbers.
+
+run_trials() uses NumPy's newer generators instead. The trials are split into batches of a
+fixed size, and batch number i always gets its own generator made from (seed, i) with a
+SeedSequence. Batch i therefore always makes the same numbers, whichever process runs it and
+whenever it runs. The batches can then be spread over as many processes as we like.
+
+Each batch only sends back three numbers: how many trials it ran, their mean and the sum of
+squared differences from the mean. Those are combined (with Chan's formula) in batch order,
+so the final mean and variance are exactly the same - to the last bit - for the same seed,
+however many processes were used.
+
+If a tolerance is given, run_trials() stops as soon as the standard error of the mean is
+that small, instead of running every trial. The check is made after each batch in batch
+order, so it also stops at exactly the same batch whatever the number of processes.
+
+A trial function takes a generator and a number n and returns an array of n results:
+
+def coin_flips(rng, n):
+    return rng.integers(0, 2, size=n)
+
+result = run_trials(coin_flips, n_trials=10000000, seed=0)
+result = run_trials(blackjack_stand_on_17, seed=0, tolerance=0.0005)
+result['mean'], result['std_error']
+
+Note: On Windows, code that starts new processes has to be run from inside an
+if __name__ == '__main__': block, and the trial function has to be defined in a module
+(not typed into the interpreter) so the other processes can find it.
+"""
+
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from Blackjack_Simulator import StandOn, play
+
+DEFAULT_BATCH_SIZE = 100000
+DEFAULT_MAX_TRIALS = 100000000
+# how many batches are handed out to each process ahead of the one being combined
+BATCHES_AHEAD = 2
+
+
+def batch_rng(seed, batch):
+    """Return the generator for batch number batch of a run started from seed."""
+    # the same generator SeedSequence(seed).spawn(batch + 1)[batch] would give, without
+    # having to know how many batches there will be
+    return np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(batch,)))
+
+
+class RunningStats:
+    """The count, mean and variance of a stream of numbers, added a batch at a time."""
+
+    def __init__(self, count=0, mean=0.0, m2=0.0):
+        self.count = count
+        self.mean = mean
+        # the sum of squared differences from the mean
+        self.m2 = m2
+
+    @classmethod
+    def of(cls, values):
+        values = np.asarray(values, dtype=float)
+        if not len(values):
+            return cls()
+        mean = float(values.mean())
+        return cls(len(values), mean, float(((values - mean) ** 2).sum()))
+
+    def merge(self, other):
+        """Add other's numbers to these (Chan's formula)."""
+        if not other.count:
+            return self
+        total = self.count + other.count
+        delta = other.mean - self.mean
+        self.m2 += other.m2 + delta * delta * self.count * other.count / total
+        self.mean += delta * other.count / total
+        self.count = total
+        return self
+
+    @property
+    def variance(self):
+        # the sample variance, like np.var(values, ddof=1)
+        return self.m2 / (self.count - 1) if self.count > 1 else float('nan')
+
+    @property
+    def std_error(self):
+        return (self.variance / self.count) ** 0.5 if self.count > 1 else float('nan')
+
+
+def _run_batch(args):
+    trial, seed, batch, n = args
+    stats = RunningStats.of(trial(batch_rng(seed, batch), n))
+    return stats.count, stats.mean, stats.m2
+
+
+def _batch_sizes(n_trials, batch_size):
+    batch = 0
+    while n_trials > 0:
+        yield batch, min(batch_size, n_trials)
+        n_trials -= batch_size
+        batch += 1
+
+
+def run_trials(trial, n_trials=None, seed=0, tolerance=None, batch_size=DEFAULT_BATCH_SIZE,
+               processes=None, min_trials=None, verbose=True):
+    """Run trial(rng, n) in batches of batch_size and return the mean of the results.
+
+    Runs n_trials trials, or (with tolerance=) stops once the standard error of the mean is at
+    most tolerance, after at least min_trials trials (the default is two batches). Returns a
+    dictionary of mean, variance, std_error, trials, batches, converged and seconds.
+    """
+    if n_trials is None:
+        if tolerance is None:
+            raise ValueError("Give n_trials, tolerance or both")
+        n_trials = DEFAULT_MAX_TRIALS
+    if min_trials is None:
+        min_trials = 2 * batch_size
+    jobs = ((trial, seed, batch, n) for batch, n in _batch_sizes(n_trials, batch_size))
+
+    if processes is None:
+        processes = os.cpu_count() or 1
+    processes = max(1, min(processes, -(-n_trials // batch_size)))
+
+    stats = RunningStats()
+    batches = 0
+    converged = False
+    start = time.perf_counter()
+
+    def add(result):
+        nonlocal batches, converged
+        stats.merge(RunningStats(*result))
+        batches += 1
+        converged = tolerance is not None and stats.count >= min_trials and stats.std_error <= tolerance
+        return converged
+
+    if processes == 1:
+        for job in jobs:
+            if add(_run_batch(job)):
+                break
+    else:
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            # keep a few batches queued up for every process, but combine them strictly in
+            # batch order so the answer doesn't depend on which process finished first
+            pending = []
+            for job in jobs:
+                pending.append(executor.submit(_run_batch, job))
+                if len(pending) < processes * BATCHES_AHEAD:
+                    continue
+                if add(pending.pop(0).result()):
+                    break
+            else:
+                while pending and not add(pending.pop(0).result()):
+                    pass
+            for future in pending:
+                future.cancel()
+
+    seconds = time.perf_counter() - start
+    if verbose:
+        print("{:,} trials in {} batches, {:.2f}s with {} process(es): mean {:.6g} +/- {:.2g}".format(
+            stats.count, batches, seconds, processes, stats.mean, stats.std_error))
+    return {'mean': stats.mean, 'variance': stats.variance, 'std_error': stats.std_error,
+            'trials': stats.count, 'batches': batches, 'converged': converged, 'seconds': seconds}
+
+
+def blackjack_stand_on_17(rng, n):
+    """An example trial: 1 if the StandOn(17) strategy won a game of blackjack, 0 if it lost."""
+    return play(StandOn(17), rng, n)
+
+
+if __name__ == '__main__':
+    for processes in (1, os.cpu_count() or 1):
+        run_trials(blackjack_stand_on_17, seed=0, tolerance=0.0002, processes=processes)
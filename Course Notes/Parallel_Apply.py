@@ -0,0 +1,189 @@
+################
+# Parallel Apply
+################
+
+"""
+The Pandas notes remean the points with a function that is called on every row:
+
+def remean_points(row):
+    row.points = row.points - review_points_mean
+    return row
+
+reviews.apply(remean_points, axis='columns')
+
+This one could be written without apply() (reviews.points - review_points_mean), but plenty of
+row functions can't, and apply() only ever uses one core of the computer.
+
+Every row is handled on its own, so the rows can be split into blocks and each block handed to
+a different process. parallel_apply() does that and glues the results back together in the
+original order:
+
+remeaned = parallel_apply(reviews, RemeanPoints(review_points_mean))
+
+Sending a block to another process normally means pickling it (turning it into bytes and back
+again), which can take longer than the work itself. Numeric columns don't have to be sent at
+all: they are copied once into shared memory (multiprocessing.shared_memory), which every
+process can read directly, and each process just gets told which rows are its block. Numeric
+results come back through shared memory the same way. Only text and other object columns
+are pickled.
+
+For small DataFrames starting the processes costs more than it saves, so below
+MIN_ROWS_PER_PROCESS rows per process parallel_apply() just calls df.apply().
+
+The function has to be one that can be pickled - defined with def (or a class) at the top of
+a module, not a lambda. benchmark() times df.apply() against parallel_apply() on remeaning.
+
+Note: On Windows, code that starts new processes has to be run from inside an
+if __name__ == '__main__': block.
+"""
+
+import os
+import pickle
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from Vectorized_Rules import make_reviews
+
+# below this many rows per process, it is faster to apply() in this process
+MIN_ROWS_PER_PROCESS = 20000
+# how many blocks each process gets (more, smaller blocks even out the work between processes)
+BLOCKS_PER_PROCESS = 4
+
+
+class RemeanPoints:
+    """remean_points() from the notes, with the mean stored on the object so it can be pickled."""
+
+    def __init__(self, review_points_mean):
+        self.review_points_mean = review_points_mean
+
+    def __call__(self, row):
+        row.points = row.points - self.review_points_mean
+        return row
+
+
+def _is_numeric(dtype):
+    return isinstance(dtype, np.dtype) and dtype.kind in 'biufc'
+
+
+def _share(df):
+    """Copy the numeric columns of df into shared memory.
+
+    Returns (the shared columns as (column, memory name, dtype, rows) tuples, the memory
+    blocks, and the columns that weren't shared).
+    """
+    shared, memories = [], []
+    for column in df.columns:
+        values = df[column].to_numpy()
+        if not _is_numeric(values.dtype):
+            continue
+        memory = shared_memory.SharedMemory(create=True, size=max(values.nbytes, 1))
+        np.ndarray(values.shape, dtype=values.dtype, buffer=memory.buf)[:] = values
+        shared.append((column, memory.name, values.dtype.str, len(values)))
+        memories.append(memory)
+    shared_columns = {column for column, name, dtype, rows in shared}
+    rest = df[[column for column in df.columns if column not in shared_columns]]
+    return shared, memories, rest
+
+
+def _unshare(shared, rest, columns, index, start=0, stop=None, unlink=False):
+    """Build a DataFrame from rows start:stop of the shared columns plus the rest."""
+    data = {}
+    for column, name, dtype, rows in shared:
+        memory = shared_memory.SharedMemory(name=name)
+        values = np.ndarray((rows,), dtype=np.dtype(dtype), buffer=memory.buf)
+        # copy the values out, so the shared memory can be closed
+        data[column] = values[start:stop].copy()
+        del values
+        memory.close()
+        if unlink:
+            memory.unlink()
+    for column in rest.columns:
+        data[column] = rest[column].array
+    return pd.DataFrame(data, index=index, columns=columns)
+
+
+def _apply_block(args):
+    fn, shared, rest, columns, index, start, stop = args
+    block = _unshare(shared, rest, columns, index, start, stop)
+    result = block.apply(fn, axis='columns')
+
+    # send numeric results back through shared memory too
+    is_series = isinstance(result, pd.Series)
+    frame = result.to_frame('result') if is_series else result
+    result_shared, memories, result_rest = _share(frame)
+    for memory in memories:
+        memory.close()
+    return (is_series, result.name if is_series else None, result_shared, result_rest,
+            list(frame.columns), frame.index)
+
+
+def _collect_block(block_result):
+    is_series, name, shared, rest, columns, index = block_result
+    frame = _unshare(shared, rest, columns, index, unlink=True)
+    return frame['result'].rename(name) if is_series else frame
+
+
+def _can_pickle(fn):
+    try:
+        pickle.dumps(fn)
+        return True
+    except Exception:
+        return False
+
+
+def parallel_apply(df, fn, processes=None, min_rows_per_process=MIN_ROWS_PER_PROCESS):
+    """Return the same result as df.apply(fn, axis='columns'), using several processes."""
+    if processes is None:
+        processes = os.cpu_count() or 1
+    processes = max(1, min(processes, len(df) // min_rows_per_process))
+    if processes > 1 and not _can_pickle(fn):
+        warnings.warn("{!r} can't be pickled (is it a lambda?), so it runs in one process".format(fn))
+        processes = 1
+    if processes == 1:
+        return df.apply(fn, axis='columns')
+
+    blocks = processes * BLOCKS_PER_PROCESS
+    bounds = np.linspace(0, len(df), blocks + 1).astype(int)
+    shared, memories, rest = _share(df)
+    try:
+        jobs = [(fn, shared, rest.iloc[start:stop], list(df.columns), df.index[start:stop], start, stop)
+                for start, stop in zip(bounds[:-1], bounds[1:]) if stop > start]
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            # map() gives the results back in the order of the jobs, whichever finishes first
+            parts = [_collect_block(result) for result in executor.map(_apply_block, jobs)]
+    finally:
+        for memory in memories:
+            memory.close()
+            memory.unlink()
+    return pd.concat(parts)
+
+
+def benchmark(n_rows=1000000, processes=None, seed=0):
+    """Time reviews.apply(remean_points, axis='columns') against parallel_apply()."""
+    reviews = make_reviews(n_rows, seed)
+    remean_points = RemeanPoints(reviews.points.mean())
+
+    start = time.perf_counter()
+    expected = reviews.apply(remean_points, axis='columns')
+    apply_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    result = parallel_apply(reviews, remean_points, processes)
+    parallel_seconds = time.perf_counter() - start
+
+    pd.testing.assert_frame_equal(result, expected)
+    print("Rows: {:,}".format(n_rows))
+    print("reviews.apply(remean_points, axis='columns'): {:.2f}s".format(apply_seconds))
+    print("parallel_apply(reviews, remean_points):       {:.2f}s".format(parallel_seconds))
+    print("Speedup: {:.1f}x with {} processes".format(apply_seconds / parallel_seconds,
+                                                    processes or os.cpu_count()))
+    return apply_seconds, parallel_seconds
+
+
+if __name__ == '__main__':
+    benchmark()
@@ -0,0 +1,168 @@
+##################
+# Partitioned Join
+##################
+
+"""
+The Renaming and Combining section joins the Canadian and British YouTube data on their
+shared (title, trending_date) index:
+
+left = canadian_youtube.set_index(['title', 'trending_date'])
+right = british_youtube.set_index(['title', 'trending_date'])
+left.join(right, lsuffix='_CAN', rsuffix='_UK')
+
+join() runs on one core, and with a dozen countries we would have to chain join() calls one
+pair at a time.
+
+A row can only ever match rows with the same key. So if we split both sides up by a hash of
+the key (every key always lands in the same partition number on both sides), partition 0 of
+the left only needs to be joined with partition 0 of the right, partition 1 with partition 1,
+and so on. The partitions don't depend on each other, so they can be joined at the same time
+in separate processes and glued back together at the end.
+
+partitioned_join() does this for any number of DataFrames at once:
+
+trending = partitioned_join(
+    {'CAN': canadian_youtube.set_index(['title', 'trending_date']),
+     'UK': british_youtube.set_index(['title', 'trending_date']),
+     'US': us_youtube.set_index(['title', 'trending_date'])},
+    how='left')
+
+Each DataFrame's columns get '_' + its name added to the end, the same as lsuffix='_CAN' and
+rsuffix='_UK'. With how='left' the result has the rows of the first DataFrame (like join()),
+with how='inner' only keys found in every DataFrame, and with how='outer' every key.
+
+Note: On Windows, code that starts new processes has to be run from inside an
+if __name__ == '__main__': block.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+# below this many rows in total it is faster to just join in this process
+MIN_ROWS_PER_PROCESS = 200000
+
+# a temporary column holding each row's position in the first frame
+_POSITION = '__position__'
+
+
+def _levels(index):
+    if isinstance(index, pd.MultiIndex):
+        return [index.get_level_values(level) for level in range(index.nlevels)]
+    return [index]
+
+
+def key_dtypes(indexes):
+    """Return the dtype every level of the key should be hashed as, so that equal keys hash
+    the same on every side (5000 in an int64 index and 5000.0 in a float64 one, say).
+
+    This is the dtype Index.union() picks. Raises a ValueError if the key's dtypes differ in a
+    way that can't be hashed the same (e.g. numbers on one side and strings on the other).
+    """
+    levels = [_levels(index) for index in indexes]
+    if len({len(frame_levels) for frame_levels in levels}) > 1:
+        raise ValueError("The DataFrames' indexes have different numbers of levels")
+    dtypes = []
+    for same_level in zip(*levels):
+        # the union of the empty indexes gives the common dtype without touching the rows
+        common = same_level[0][:0]
+        for level in same_level[1:]:
+            common = common.union(level[:0])
+        differ = any(level.dtype != same_level[0].dtype for level in same_level)
+        if differ and common.dtype == object:
+            raise ValueError("Index levels of dtypes {} can't be joined in partitions - convert "
+                             "them to the same dtype first".format([str(level.dtype) for level in same_level]))
+        dtypes.append(common.dtype)
+    return dtypes
+
+
+def partition_numbers(index, partitions, dtypes=None):
+    """Return the partition each row of index belongs in, based on a hash of its key.
+
+    dtypes (from key_dtypes()) are the dtypes to hash each level of the key as.
+    """
+    levels = _levels(index)
+    if dtypes is not None:
+        levels = [level.astype(dtype, copy=False) for level, dtype in zip(levels, dtypes)]
+    keys = pd.DataFrame({number: level.to_numpy() for number, level in enumerate(levels)})
+    hashes = pd.util.hash_pandas_object(keys, index=False).to_numpy()
+    return (hashes % np.uint64(partitions)).astype(np.intp)
+
+
+def _suffixed(frames, suffixes):
+    """Return the frames with each one's suffix added to its column names, but only for
+    column names that appear in more than one frame (like join() does with lsuffix/rsuffix).
+    """
+    counts = {}
+    for frame in frames:
+        for column in frame.columns:
+            counts[column] = counts.get(column, 0) + 1
+    return [frame.rename(columns={column: str(column) + suffix
+                                  for column in frame.columns if counts[column] > 1})
+            for frame, suffix in zip(frames, suffixes)]
+
+
+def join_many(frames, suffixes, how='left'):
+    """Join a list of DataFrames on their index, in one process.
+
+    The result is the same as chaining frames[0].join(frames[1], ...).join(frames[2], ...),
+    with the suffixes added to overlapping column names.
+    """
+    frames = _suffixed(frames, suffixes)
+    result = frames[0]
+    if len(frames) > 1:
+        result = result.join(frames[1:], how=how)
+    return result
+
+
+def _join_partition(args):
+    frames, suffixes, how = args
+    return join_many(frames, suffixes, how)
+
+
+def partitioned_join(frames, how='left', partitions=None, processes=None):
+    """Join several DataFrames on their (shared) index, in parallel.
+
+    frames is a dictionary of {name: DataFrame}; overlapping columns get '_' + name added to
+    them. how is 'left', 'inner' or 'outer'. The rows of the result come in the same order
+    as the first DataFrame for how='left' or 'inner', and are sorted by key for how='outer'.
+    """
+    if how not in ('left', 'inner', 'outer'):
+        raise ValueError("how must be 'left', 'inner' or 'outer'")
+    names = list(frames)
+    frames = [frames[name] for name in names]
+    suffixes = ['_' + str(name) for name in names]
+
+    if processes is None:
+        processes = os.cpu_count() or 1
+    total_rows = sum(len(frame) for frame in frames)
+    processes = max(1, min(processes, total_rows // MIN_ROWS_PER_PROCESS))
+    if processes == 1:
+        result = join_many(frames, suffixes, how)
+        return result.sort_index(kind='stable') if how == 'outer' else result
+    if partitions is None:
+        partitions = processes
+
+    # remember where each row of the first frame was, so the rows can be put back in order
+    first = frames[0].copy()
+    first[_POSITION] = np.arange(len(first))
+    frames = [first] + frames[1:]
+
+    # split every frame the same way, so matching keys always end up in the same partition
+    # (hashed as the same dtype on every side)
+    dtypes = key_dtypes([frame.index for frame in frames])
+    numbers = [partition_numbers(frame.index, partitions, dtypes) for frame in frames]
+    jobs = [([frame[number == partition] for frame, number in zip(frames, numbers)], suffixes, how)
+            for partition in range(partitions)]
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        result = pd.concat(executor.map(_join_partition, jobs))
+
+    if how == 'outer':
+        result = result.sort_index(kind='stable')
+    else:
+        # every row came from a row of the first frame, and the rows for one key are already
+        # in the right order inside their partition, so a stable sort puts everything back
+        result = result.iloc[np.argsort(result[_POSITION].to_numpy(), kind='stable')]
+    return result.drop(columns=_POSITION)
@@ -0,0 +1,201 @@
+###################
+# Secondary Indexes
+###################
+
+"""
+The Conditional Selection of Data part of the Pandas notes filters rows like this:
+
+reviews.loc[reviews.country == 'Italy']
+reviews.loc[reviews.country.isin(['Italy', 'France'])]
+reviews.loc[(reviews.country == 'Italy') & (reviews.points >= 90)]
+
+Every one of these compares every single row, every time. That's fine once, but a dashboard
+that asks thousands of these questions a minute about the same DataFrame does the same work
+over and over.
+
+A database would solve this with an index, and we can do the same thing:
+
+- A hash index is a dictionary from each value in a column to the rows that hold it. Finding
+the Italian wines is then one dictionary lookup instead of 130k comparisons.
+- A sorted index keeps the row numbers of a column in order of its values. All the rows with
+points >= 90 are then one block at the end, and np.searchsorted() finds where the block
+starts without looking at every row.
+
+IndexedFrame wraps a DataFrame, keeps the indexes we ask for and uses them automatically:
+
+indexed = IndexedFrame(reviews)
+indexed.add_hash_index('country')
+indexed.add_sorted_index('points')
+indexed.add_sorted_index('price')
+
+indexed.select(('country', '==', 'Italy'))
+indexed.select(('country', 'isin', ['Italy', 'France']))
+indexed.select(('country', '==', 'Italy'), ('points', '>=', 90))
+
+select() gives back exactly the same rows, in the same order, as the reviews.loc[...] version.
+Conditions on columns without an index still work, they just compare every row. So do isin()
+lists with a missing value in them (hash indexes leave missing values out).
+
+Changing a column (indexed['points'] = ..., or straight on the DataFrame with
+reviews['points'] = ... or reviews.loc[...] = ...) means that column's indexes are rebuilt the
+next time they are needed: every index remembers the array its column had when it was built,
+and pandas gives a column a new array whenever it changes. Adding a new column like
+indexed['critic'] = 'everyone' doesn't touch the other indexes. indexed.refresh() throws
+every index away.
+"""
+
+import numpy as np
+import pandas as pd
+
+HASH_OPERATORS = ('==', 'isin')
+SORTED_OPERATORS = ('==', '<', '<=', '>', '>=')
+
+# the comparisons select() can do by scanning every row, when no index can help
+_SCAN = {
+    '==': lambda column, value: column == value,
+    '!=': lambda column, value: column != value,
+    '<': lambda column, value: column < value,
+    '<=': lambda column, value: column <= value,
+    '>': lambda column, value: column > value,
+    '>=': lambda column, value: column >= value,
+    'isin': lambda column, value: column.isin(value),
+}
+
+
+def _has_missing(values):
+    return any(pd.api.types.is_scalar(value) and pd.isnull(value) for value in values)
+
+
+class HashIndex:
+    """A dictionary from each value of a column to the (sorted) row positions holding it."""
+
+    def __init__(self, column):
+        # groupby().indices is exactly this dictionary, and missing values are left out (so
+        # isin() with a missing value among its values is done by scanning instead)
+        self.positions = column.groupby(column, sort=False, observed=True).indices
+
+    def lookup(self, operator, value):
+        values = [value] if operator == '==' else list(value)
+        found = [self.positions[v] for v in values if v in self.positions]
+        if not found:
+            return np.array([], dtype=np.intp)
+        if len(found) == 1:
+            return found[0]
+        return np.sort(np.concatenate(found))
+
+
+class SortedIndex:
+    """The row positions of a column, ordered by the column's values."""
+
+    def __init__(self, column):
+        values = column.to_numpy()
+        missing = pd.isnull(values)
+        present = np.flatnonzero(~missing)
+        # missing values can never match a comparison, so they are left out
+        order = np.argsort(values[present], kind='stable')
+        self.order = present[order]
+        self.values = values[present][order]
+
+    def lookup(self, operator, value):
+        if operator == '==':
+            start = np.searchsorted(self.values, value, side='left')
+            end = np.searchsorted(self.values, value, side='right')
+        elif operator in ('>', '>='):
+            start = np.searchsorted(self.values, value, side='right' if operator == '>' else 'left')
+            end = len(self.values)
+        else:
+            start = 0
+            end = np.searchsorted(self.values, value, side='left' if operator == '<' else 'right')
+        return np.sort(self.order[start:end])
+
+
+def _same_values(built_from, column):
+    """Return whether column is still backed by the same array as built_from."""
+    if len(built_from) != len(column):
+        return False
+    if isinstance(built_from.dtype, np.dtype):
+        # the same memory, seen the same way (a view into the same block of the DataFrame)
+        before = built_from.to_numpy().__array_interface__
+        after = column.to_numpy().__array_interface__
+        return (before['data'], before['strides'], before['typestr']) == \
+            (after['data'], after['strides'], after['typestr'])
+    return built_from.array is column.array
+
+
+class IndexedFrame:
+    """A DataFrame plus opt-in hash and sorted indexes that select() uses automatically."""
+
+    def __init__(self, df):
+        self.df = df
+        self.indexed_columns = {}   # column name -> set of 'hash' and/or 'sorted'
+        self.indexes = {}           # (column name, kind) -> HashIndex or SortedIndex
+        # (column name, kind) -> the column the index was built from. Holding on to it also
+        # means pandas (copy-on-write) copies the column before changing it in place, so any
+        # change to the column - even df.loc[...] = ... - gives it a new array
+        self.built_from = {}
+
+    def add_hash_index(self, column):
+        """Use a hash index for ==/isin conditions on column."""
+        self.indexed_columns.setdefault(column, set()).add('hash')
+        return self
+
+    def add_sorted_index(self, column):
+        """Use a sorted index for ==, <, <=, >, >= conditions on column."""
+        self.indexed_columns.setdefault(column, set()).add('sorted')
+        return self
+
+    def _index(self, column, kind):
+        # indexes are built the first time they are used, and again after being thrown away
+        # or when the column was changed without going through the wrapper
+        key = (column, kind)
+        values = self.df[column]
+        if key not in self.indexes or not _same_values(self.built_from[key], values):
+            if kind == 'hash':
+                self.indexes[key] = HashIndex(values)
+            else:
+                self.indexes[key] = SortedIndex(values)
+            self.built_from[key] = values
+        return self.indexes[key]
+
+    def invalidate(self, column):
+        """Throw away the indexes of column, so they get rebuilt when next needed."""
+        for kind in ('hash', 'sorted'):
+            self.indexes.pop((column, kind), None)
+            self.built_from.pop((column, kind), None)
+
+    def refresh(self):
+        """Throw away every index, e.g. after the DataFrame was changed outside the wrapper."""
+        self.indexes = {}
+        self.built_from = {}
+
+    def __setitem__(self, column, value):
+        self.df[column] = value
+        self.invalidate(column)
+
+    def __getitem__(self, column):
+        return self.df[column]
+
+    def positions(self, column, operator, value):
+        """Return the sorted row positions where df[column] <operator> value is True."""
+        if operator not in _SCAN:
+            raise ValueError("Unknown operator {!r}".format(operator))
+        kinds = self.indexed_columns.get(column, set())
+        if 'hash' in kinds and operator in HASH_OPERATORS and \
+                not (operator == 'isin' and _has_missing(value)):
+            return self._index(column, 'hash').lookup(operator, value)
+        if 'sorted' in kinds and operator in SORTED_OPERATORS:
+            return self._index(column, 'sorted').lookup(operator, value)
+        return np.flatnonzero(_SCAN[operator](self.df[column], value).to_numpy())
+
+    def select(self, *conditions):
+        """Return the rows matching every (column, operator, value) condition - the same as
+        reviews.loc[(condition 1) & (condition 2) & ...].
+        """
+        if not conditions:
+            return self.df
+        # start with the condition that matches the fewest rows, then narrow it down
+        matches = sorted((self.positions(*condition) for condition in conditions), key=len)
+        positions = matches[0]
+        for other in matches[1:]:
+            positions = np.intersect1d(positions, other, assume_unique=True)
+        return self.df.iloc[positions]
@@ -0,0 +1,196 @@
+###################
+# Streaming Groupby
+###################
+
+"""
+The Grouping and Sorting recipes in the Pandas notes all need the whole DataFrame in memory:
+
+reviews.groupby('variety').price.agg(['min', 'max'])
+reviews.groupby(['country', 'variety']).size()
+reviews.groupby('taster_name').points.mean()
+
+But none of these answers actually need every row at once. For each group we only have to
+remember a few running numbers - how many rows (size), how many non-missing values (count),
+their sum, the smallest (min) and the biggest (max). The mean is just sum / count. Those
+numbers can be worked out for each chunk of the file and then added together.
+
+StreamingGroupby does exactly that:
+
+grouped = StreamingGroupby(by='variety', column='price', aggs=['min', 'max'])
+for chunk in read_csv_chunks("../input/wine-reviews/winemag-data-130k-v2.csv", index_col=0):
+    grouped.update(chunk)
+price_extremes = grouped.result()
+
+or in one line:
+
+price_extremes = streaming_groupby(read_csv_chunks(wine_path, index_col=0),
+                                   by='variety', column='price', aggs=['min', 'max'])
+
+If there are more groups than max_groups, the running numbers are written to temporary files
+on disk (split up by a hash of the group key, so each group always goes to the same file)
+and combined one file at a time at the end. That way even a huge number of groups never has
+to fit in memory all at once.
+
+The result has the same shape as the pandas version: a Series when aggs is a single name like
+'mean' or 'size', and a DataFrame with one column per name when aggs is a list.
+"""
+
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+AGGREGATIONS = ('size', 'count', 'sum', 'min', 'max', 'mean')
+DEFAULT_MAX_GROUPS = 1000000
+DEFAULT_PARTITIONS = 16
+
+# how each running number is combined when two partial results for the same group meet
+_COMBINE = {'size': 'sum', 'count': 'sum', 'sum': 'sum', 'min': 'min', 'max': 'max'}
+
+
+def _states_needed(aggs):
+    """Return the running numbers needed to work out aggs (mean needs sum and count)."""
+    needed = []
+    for agg in aggs:
+        for state in (('sum', 'count') if agg == 'mean' else (agg,)):
+            if state not in needed:
+                needed.append(state)
+    return needed
+
+
+class StreamingGroupby:
+    """A groupby/agg that is fed one chunk at a time and only keeps a few numbers per group."""
+
+    def __init__(self, by, column=None, aggs='size', max_groups=DEFAULT_MAX_GROUPS,
+                 partitions=DEFAULT_PARTITIONS, spill_dir=None):
+        self.by = by
+        self.column = column
+        self.single = isinstance(aggs, str)
+        self.aggs = [aggs] if self.single else list(aggs)
+        for agg in self.aggs:
+            if agg not in AGGREGATIONS:
+                raise ValueError("Unknown aggregation {!r}, use one of {}".format(agg, AGGREGATIONS))
+        if column is None and self.aggs != ['size']:
+            raise ValueError("A column is needed for any aggregation other than 'size'")
+
+        self.states = _states_needed(self.aggs)
+        self.max_groups = max_groups
+        self.partitions = partitions
+        self.spill_dir = spill_dir
+        self._made_spill_dir = False
+        self._spill_files = [[] for _ in range(partitions)]
+        self.state = None
+
+    def _chunk_states(self, chunk):
+        grouped = chunk.groupby(self.by, sort=False, observed=True)
+        if self.column is None:
+            return grouped.size().to_frame('size')
+        return grouped[self.column].agg(self.states)
+
+    def _combine(self, frames):
+        combined = pd.concat(frames)
+        levels = list(range(combined.index.nlevels))
+        return combined.groupby(level=levels, sort=False).agg(
+            {state: _COMBINE[state] for state in self.states})
+
+    def update(self, chunk):
+        """Add the rows of chunk (a DataFrame) to the running numbers."""
+        states = self._chunk_states(chunk)
+        self.state = states if self.state is None else self._combine([self.state, states])
+        if len(self.state) > self.max_groups:
+            self._spill()
+        return self
+
+    def _partition_numbers(self, states):
+        hashes = pd.util.hash_pandas_object(states.index, index=False).to_numpy()
+        return hashes % np.uint64(self.partitions)
+
+    def _spill(self):
+        """Write the running numbers to disk, one file per partition, and start again."""
+        if self.spill_dir is None:
+            self.spill_dir = tempfile.mkdtemp(prefix='groupby-spill-')
+            self._made_spill_dir = True
+        numbers = self._partition_numbers(self.state)
+        for partition in range(self.partitions):
+            part = self.state[numbers == partition]
+            if len(part):
+                path = os.path.join(self.spill_dir, 'part-{}-{}.pkl'.format(
+                    partition, len(self._spill_files[partition])))
+                part.to_pickle(path)
+                self._spill_files[partition].append(path)
+        self.state = None
+
+    def _finish(self, states):
+        """Turn the running numbers into the aggregations that were asked for."""
+        result = pd.DataFrame(index=states.index)
+        for agg in self.aggs:
+            if agg == 'mean':
+                count = states['count'].where(states['count'] > 0)
+                result['mean'] = states['sum'] / count
+            else:
+                result[agg] = states[agg]
+        return result
+
+    def result(self, sort=True):
+        """Return the final aggregations, sorted by group key like groupby() does by default."""
+        if not any(self._spill_files):
+            if self.state is None:
+                return self._empty()
+            result = self._finish(self.state)
+        else:
+            # combine one partition at a time - a group is always in the same partition
+            numbers = None if self.state is None else self._partition_numbers(self.state)
+            parts = []
+            for partition, paths in enumerate(self._spill_files):
+                frames = [pd.read_pickle(path) for path in paths]
+                if self.state is not None:
+                    frames.append(self.state[numbers == partition])
+                if frames:
+                    parts.append(self._finish(self._combine(frames)))
+            result = pd.concat(parts)
+            self._cleanup()
+
+        if sort:
+            result = result.sort_index()
+        result.index.names = [self.by] if isinstance(self.by, str) else list(self.by)
+        return self._shape(result)
+
+    def _empty(self):
+        names = [self.by] if isinstance(self.by, str) else list(self.by)
+        if len(names) == 1:
+            index = pd.Index([], name=names[0])
+        else:
+            index = pd.MultiIndex.from_arrays([[] for _ in names], names=names)
+        return self._shape(pd.DataFrame({agg: [] for agg in self.aggs}, index=index))
+
+    def _shape(self, result):
+        if self.single:
+            series = result[self.aggs[0]]
+            # groupby().size() gives an unnamed Series, groupby().points.mean() is named points
+            series.name = None if self.aggs[0] == 'size' else self.column
+            return series
+        return result
+
+    def _cleanup(self):
+        for paths in self._spill_files:
+            for path in paths:
+                if os.path.exists(path):
+                    os.remove(path)
+        self._spill_files = [[] for _ in range(self.partitions)]
+        if self._made_spill_dir:
+            shutil.rmtree(self.spill_dir, ignore_errors=True)
+            self.spill_dir = None
+            self._made_spill_dir = False
+
+
+def streaming_groupby(chunks, by, column=None, aggs='size', sort=True, **kwargs):
+    """Return the same result as df.groupby(by)[column].agg(aggs) for a stream of chunks.
+
+    Other keyword arguments (max_groups, partitions, spill_dir) go to StreamingGroupby.
+    """
+    grouped = StreamingGroupby(by, column, aggs, **kwargs)
+    for chunk in chunks:
+        grouped.update(chunk)
+    return grouped.result(sort=sort)
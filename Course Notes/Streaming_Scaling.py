@@ -0,0 +1,308 @@
+###################
+# Streaming Scaling
+###################
+
+"""
+The Scaling and Normalization section of the Data Cleaning notes scales and normalizes the
+Kickstarter columns in one go:
+
+scaled_data = minmax_scaling(original_data, columns=['usd_goal_real'])
+normalized_pledges = stats.boxcox(positive_pledges)[0]
+
+Both need the whole column in memory, and both work their numbers out again from scratch
+every time they are called. So when a few thousand new projects come in each day, the only
+way to scale them the same way as the old ones is to load all of history again.
+
+But the numbers behind the scaling are small:
+
+- Min-max scaling only needs the smallest and biggest value of each column, and those can be
+found one chunk at a time.
+- Box-Cox needs its lambda, the power that makes the data look the most "normal". scipy finds
+it by trying values of lambda until the log-likelihood is as big as it can be. For any one
+lambda, the log-likelihood only needs how many values there are, the sum of their logs and
+the variance of the transformed values - and all of those can be added up chunk by chunk.
+So we add them up for a whole grid of lambdas at once, pick the best one and then fit a
+parabola through it and its neighbours to find the peak between the grid points. (Or, with
+sample_size=, keep a random sample of the values and give that to scipy.)
+
+So scaling becomes two passes: fit() the numbers (pass 1), then transform() each chunk
+(pass 2). The fitted numbers can be saved to a JSON file and loaded back the next day:
+
+scaler = MinMaxScaler(['usd_goal_real'])
+fit_chunks([scaler], read_csv_chunks(ks_path, usecols=['usd_goal_real']))
+scaler.save('goal_scaler.json')
+
+boxcox = BoxCoxTransformer(['usd_pledged_real'])
+chunks = read_csv_chunks(ks_path, usecols=['usd_pledged_real'])
+fit_chunks([boxcox], (chunk[chunk.usd_pledged_real > 0] for chunk in chunks))
+boxcox.save('pledged_boxcox.json')
+
+# the next day
+scaler = MinMaxScaler.load('goal_scaler.json')
+scaled_goals = scaler.transform(new_projects)
+
+The saved file keeps the running numbers too, so calling update() with just the new rows
+(and not the old ones again) gives the same fit as fitting on everything. Note that values
+outside the fitted range scale to below 0 or above 1 - that is what keeps new rows comparable
+with the old ones.
+
+Box-Cox only works on positive values, like in the notes the zeros have to be taken out first.
+"""
+
+import json
+
+import numpy as np
+import pandas as pd
+from scipy import special, stats
+
+# the lambdas BoxCoxTransformer tries. scipy's answer for real data is almost always in here
+DEFAULT_LAMBDAS = np.linspace(-2, 2, 161)
+# how many lambdas are transformed at once (more uses more memory, but fewer numpy calls)
+LAMBDA_BLOCK = 32
+
+
+class MinMaxScaler:
+    """Scales columns to between min_val and max_val, like mlxtend's minmax_scaling()."""
+
+    def __init__(self, columns, min_val=0, max_val=1):
+        self.columns = [columns] if isinstance(columns, str) else list(columns)
+        self.min_val = min_val
+        self.max_val = max_val
+        self.minimums = {column: None for column in self.columns}
+        self.maximums = {column: None for column in self.columns}
+
+    def update(self, chunk):
+        """Pass 1: take the smallest and biggest values of chunk into account."""
+        for column in self.columns:
+            values = chunk[column].to_numpy(dtype=float)
+            values = values[~np.isnan(values)]
+            if not len(values):
+                continue
+            low, high = values.min(), values.max()
+            if self.minimums[column] is None or low < self.minimums[column]:
+                self.minimums[column] = float(low)
+            if self.maximums[column] is None or high > self.maximums[column]:
+                self.maximums[column] = float(high)
+        return self
+
+    def transform(self, chunk):
+        """Pass 2: return the scaled columns of chunk as a new DataFrame."""
+        result = pd.DataFrame(index=chunk.index)
+        for column in self.columns:
+            if self.minimums[column] is None:
+                raise ValueError("Column {!r} hasn't been fitted yet".format(column))
+            low, high = self.minimums[column], self.maximums[column]
+            scaled = (chunk[column].astype(float) - low) / (high - low)
+            if not (self.min_val == 0 and self.max_val == 1):
+                scaled = scaled * (self.max_val - self.min_val) + self.min_val
+            result[column] = scaled
+        return result
+
+    def to_dict(self):
+        return {'kind': 'minmax', 'columns': self.columns, 'min_val': self.min_val,
+                'max_val': self.max_val, 'minimums': self.minimums, 'maximums': self.maximums}
+
+    @classmethod
+    def from_dict(cls, parameters):
+        scaler = cls(parameters['columns'], parameters['min_val'], parameters['max_val'])
+        scaler.minimums = dict(parameters['minimums'])
+        scaler.maximums = dict(parameters['maximums'])
+        return scaler
+
+    def save(self, path):
+        _save(self.to_dict(), path)
+
+    @classmethod
+    def load(cls, path):
+        return cls.from_dict(_load(path))
+
+
+class _LogLikelihoodSums:
+    """The running numbers behind the Box-Cox log-likelihood of one column, for every lambda.
+
+    For each lambda the mean and the sum of squared differences from the mean (M2) of the
+    transformed values are kept, and chunks are merged with Chan's formula - adding up plain
+    sums of squares would lose most of the precision with values as big as the pledges.
+    """
+
+    def __init__(self, lambdas):
+        self.lambdas = np.asarray(lambdas, dtype=float)
+        self.count = 0
+        self.sum_of_logs = 0.0
+        self.means = np.zeros(len(self.lambdas))
+        self.m2 = np.zeros(len(self.lambdas))
+
+    def update(self, values):
+        if not len(values):
+            return
+        n = len(values)
+        means = np.empty(len(self.lambdas))
+        m2 = np.empty(len(self.lambdas))
+        for start in range(0, len(self.lambdas), LAMBDA_BLOCK):
+            block = self.lambdas[start:start + LAMBDA_BLOCK]
+            transformed = special.boxcox(values[None, :], block[:, None])
+            means[start:start + len(block)] = transformed.mean(axis=1)
+            m2[start:start + len(block)] = ((transformed - means[start:start + len(block), None]) ** 2).sum(axis=1)
+
+        total = self.count + n
+        delta = means - self.means
+        self.m2 = self.m2 + m2 + delta ** 2 * self.count * n / total
+        self.means = self.means + delta * n / total
+        self.count = total
+        self.sum_of_logs += float(np.log(values).sum())
+
+    def log_likelihoods(self):
+        # the same formula as scipy.stats.boxcox_llf()
+        variances = self.m2 / self.count
+        return (self.lambdas - 1) * self.sum_of_logs - self.count / 2 * np.log(variances)
+
+    def best_lambda(self):
+        llf = self.log_likelihoods()
+        best = int(np.nanargmax(llf))
+        if best == 0 or best == len(llf) - 1:
+            return float(self.lambdas[best])
+        # the peak of the parabola through the best grid point and its two neighbours
+        left, middle, right = llf[best - 1:best + 2]
+        step = self.lambdas[best + 1] - self.lambdas[best]
+        curvature = left - 2 * middle + right
+        if curvature >= 0:
+            return float(self.lambdas[best])
+        return float(self.lambdas[best] + step * (left - right) / (2 * curvature))
+
+    def to_dict(self):
+        return {'lambdas': self.lambdas.tolist(), 'count': self.count,
+                'sum_of_logs': self.sum_of_logs, 'means': self.means.tolist(), 'm2': self.m2.tolist()}
+
+    @classmethod
+    def from_dict(cls, parameters):
+        sums = cls(parameters['lambdas'])
+        sums.count = parameters['count']
+        sums.sum_of_logs = parameters['sum_of_logs']
+        sums.means = np.array(parameters['means'], dtype=float)
+        sums.m2 = np.array(parameters['m2'], dtype=float)
+        return sums
+
+
+class _Sample:
+    """A random sample of at most size values, the same whichever chunks the values came in.
+
+    Every value gets a random key and the values with the smallest keys are kept.
+    """
+
+    def __init__(self, size, seed=0):
+        self.size = size
+        self.random = np.random.default_rng(seed)
+        self.keys = np.array([])
+        self.values = np.array([])
+
+    def update(self, values):
+        keys = np.concatenate([self.keys, self.random.random(len(values))])
+        values = np.concatenate([self.values, values])
+        if len(keys) > self.size:
+            keep = np.argpartition(keys, self.size - 1)[:self.size]
+            keys, values = keys[keep], values[keep]
+        self.keys, self.values = keys, values
+
+    def best_lambda(self):
+        # the same call stats.boxcox() makes when it isn't given a lambda
+        return float(stats.boxcox_normmax(self.values, method='mle'))
+
+    def to_dict(self):
+        return {'size': self.size, 'keys': self.keys.tolist(), 'values': self.values.tolist(),
+                'random_state': self.random.bit_generator.state}
+
+    @classmethod
+    def from_dict(cls, parameters):
+        sample = cls(parameters['size'])
+        sample.keys = np.array(parameters['keys'], dtype=float)
+        sample.values = np.array(parameters['values'], dtype=float)
+        # carry on with the same random numbers, so loading and updating doesn't repeat keys
+        sample.random.bit_generator.state = parameters['random_state']
+        return sample
+
+
+class BoxCoxTransformer:
+    """Box-Cox transforms columns with a lambda fitted one chunk at a time.
+
+    By default lambda comes from the log-likelihood on a grid of lambdas. Give sample_size= to
+    fit lambda with scipy on a random sample of that many values instead.
+    """
+
+    def __init__(self, columns, lambdas=DEFAULT_LAMBDAS, sample_size=None):
+        self.columns = [columns] if isinstance(columns, str) else list(columns)
+        if sample_size is None:
+            self.fits = {column: _LogLikelihoodSums(lambdas) for column in self.columns}
+        else:
+            self.fits = {column: _Sample(sample_size) for column in self.columns}
+        self.lambdas = {}
+
+    def update(self, chunk):
+        """Pass 1: add the values of chunk to the fit. Missing values are skipped."""
+        for column in self.columns:
+            values = chunk[column].to_numpy(dtype=float)
+            values = values[~np.isnan(values)]
+            if (values <= 0).any():
+                raise ValueError("Box-Cox needs positive values, but column {!r} has values <= 0"
+                                 .format(column))
+            self.fits[column].update(values)
+            # worked out again when next needed
+            self.lambdas.pop(column, None)
+        return self
+
+    def lambda_(self, column):
+        """Return the fitted lambda of column."""
+        if column not in self.lambdas:
+            self.lambdas[column] = self.fits[column].best_lambda()
+        return self.lambdas[column]
+
+    def transform(self, chunk):
+        """Pass 2: return the transformed columns of chunk as a new DataFrame."""
+        result = pd.DataFrame(index=chunk.index)
+        for column in self.columns:
+            result[column] = special.boxcox(chunk[column].to_numpy(dtype=float), self.lambda_(column))
+        return result
+
+    def to_dict(self):
+        return {'kind': 'boxcox', 'columns': self.columns,
+                'lambdas': {column: self.lambda_(column) for column in self.columns},
+                'fits': {column: self.fits[column].to_dict() for column in self.columns}}
+
+    @classmethod
+    def from_dict(cls, parameters):
+        transformer = cls(parameters['columns'])
+        for column, fit in parameters['fits'].items():
+            fit_class = _Sample if 'size' in fit else _LogLikelihoodSums
+            transformer.fits[column] = fit_class.from_dict(fit)
+        transformer.lambdas = dict(parameters['lambdas'])
+        return transformer
+
+    def save(self, path):
+        _save(self.to_dict(), path)
+
+    @classmethod
+    def load(cls, path):
+        return cls.from_dict(_load(path))
+
+
+def _save(parameters, path):
+    with open(path, 'w') as file:
+        json.dump(parameters, file, indent=2)
+
+
+def _load(path):
+    with open(path) as file:
+        return json.load(file)
+
+
+def fit_chunks(scalers, chunks):
+    """Pass 1: update() every scaler with every chunk, reading the chunks only once."""
+    for chunk in chunks:
+        for scaler in scalers:
+            scaler.update(chunk)
+    return scalers
+
+
+def transform_chunks(scaler, chunks):
+    """Pass 2: transform() each chunk in turn."""
+    for chunk in chunks:
+        yield scaler.transform(chunk)
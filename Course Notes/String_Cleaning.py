@@ -0,0 +1,102 @@
+#################
+# String Cleaning
+#################
+
+"""
+The Inconsistent Data Entry section cleans up a column with two passes:
+
+professors['Country'] = professors['Country'].str.lower()
+professors['Country'] = professors['Country'].str.strip()
+
+Each pass goes through every row and builds a whole new column. But a column like Country only
+has a handful of different values - the same few dozen countries over and over. Cleaning
+"Germany " once is enough, however many rows it is in.
+
+clean_column() does every cleaning step on each *different* value once, in one go, and then
+copies the answers back out to the rows:
+
+1. pd.factorize() gives every row a number (its "code") for which of the unique values it has.
+2. Each unique value is cleaned: Unicode NFKC (optional - it turns things like full-width
+letters and non-breaking spaces into the plain versions), lower case, strip, and turning any
+run of spaces/tabs/newlines inside the value into a single space.
+3. The cleaned values are looked up by code for every row, which is one NumPy operation.
+
+professors['Country'] = clean_column(professors['Country'])
+professors['Country'] = clean_column(professors['Country'], as_category=True)  # even less memory
+
+With collapse_whitespace=False and nfkc=False the result is exactly the same as
+.str.lower().str.strip(), except that missing values all come back as NaN. Values that
+aren't strings become NaN too, like they do with .str.
+"""
+
+import time
+import unicodedata
+
+import numpy as np
+import pandas as pd
+
+
+def clean_text(value, collapse_whitespace=True, nfkc=False):
+    """Clean one string: NFKC (optional), lower case, strip and collapse whitespace."""
+    if nfkc:
+        # first, so the whitespace and upper case letters it makes get cleaned up too
+        value = unicodedata.normalize('NFKC', value)
+    value = value.lower()
+    if collapse_whitespace:
+        # split() with no arguments splits on any run of whitespace and drops it at both
+        # ends, so this strips and collapses in one step
+        return ' '.join(value.split())
+    return value.strip()
+
+
+def clean_column(column, collapse_whitespace=True, nfkc=False, as_category=False):
+    """Return column cleaned with clean_text(), cleaning each different value only once."""
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        # already has codes and unique values
+        codes = column.cat.codes.to_numpy()
+        uniques = column.cat.categories
+    else:
+        codes, uniques = pd.factorize(column)
+
+    cleaned = [clean_text(value, collapse_whitespace, nfkc) if isinstance(value, str) else np.nan
+               for value in uniques]
+    # different values can become the same once cleaned ("Germany" and " germany"), so number
+    # the cleaned values again and point every old code at its new one
+    new_codes, new_uniques = pd.factorize(pd.Series(cleaned, dtype=object))
+    codes = np.where(codes >= 0, np.r_[new_codes, -1][codes], -1)
+
+    if as_category:
+        values = pd.Categorical.from_codes(codes, categories=new_uniques)
+        return pd.Series(values, index=column.index, name=column.name)
+    if isinstance(column.dtype, pd.StringDtype):
+        # keep pandas' own string type (a code of -1 becomes missing)
+        values = pd.array(list(new_uniques), dtype=column.dtype).take(codes, allow_fill=True)
+        return pd.Series(values, index=column.index, name=column.name)
+    values = np.r_[np.asarray(new_uniques, dtype=object), np.nan][codes]
+    return pd.Series(values, index=column.index, name=column.name, dtype=object)
+
+
+def benchmark(n_rows=1000000, n_uniques=200, dtype=object, seed=0):
+    """Time .str.lower().str.strip() against clean_column() on a column with few uniques."""
+    rng = np.random.default_rng(seed)
+    spellings = ['{}Country {}{}'.format(' ' * (i % 3), i // 2, ' ' * (i % 2)) for i in range(n_uniques)]
+    column = pd.Series(np.asarray(spellings, dtype=object)[rng.integers(0, n_uniques, n_rows)], dtype=dtype)
+
+    start = time.perf_counter()
+    expected = column.str.lower().str.strip()
+    str_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    result = clean_column(column, collapse_whitespace=False)
+    clean_seconds = time.perf_counter() - start
+
+    pd.testing.assert_series_equal(result, expected)
+    print("Rows: {:,}, unique values: {:,}".format(n_rows, n_uniques))
+    print(".str.lower().str.strip(): {:.3f}s".format(str_seconds))
+    print("clean_column():           {:.3f}s".format(clean_seconds))
+    print("Speedup: {:,.1f}x".format(str_seconds / clean_seconds))
+    return str_seconds, clean_seconds
+
+
+if __name__ == '__main__':
+    benchmark()
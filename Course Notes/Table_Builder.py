@@ -0,0 +1,119 @@
+###############
+# Table Builder
+###############
+
+"""
+The Renaming and Combining section glues the Canadian and British YouTube data together with
+
+pd.concat([canadian_youtube, british_youtube])
+
+concat() copies every column into a brand new DataFrame. That is fine for two files, but if
+we read hundreds of per-country, per-day files and concat() each new one onto the running
+total, every file gets copied again and again - the amount of copying grows with the square
+of the number of files.
+
+TableBuilder collects the DataFrames without copying them. The first one decides the column
+names and dtypes (the "schema"), and every DataFrame after that is just checked against it.
+Only when build() is called is every column copied once, straight into a single array of the
+final size:
+
+builder = TableBuilder()
+for path in youtube_paths:
+    builder.append(pd.read_csv(path))
+
+builder.shape                # (total rows, columns), without building anything
+builder.head()               # only looks at the first DataFrame(s)
+builder['views']             # builds just the one column
+youtube = builder.build()    # the same as pd.concat(all_of_the_frames)
+"""
+
+import numpy as np
+import pandas as pd
+
+
+class TableBuilder:
+    """Collects DataFrames with the same columns and builds one DataFrame from them at the end."""
+
+    def __init__(self, ignore_index=False):
+        self.ignore_index = ignore_index
+        self.chunks = []
+        self.columns = None
+        self.dtypes = None
+        self.rows = 0
+
+    def append(self, df):
+        """Add df to the table. Its columns and dtypes must match the first DataFrame added."""
+        if self.columns is None:
+            self.columns = df.columns
+            self.dtypes = df.dtypes
+        elif not df.columns.equals(self.columns):
+            raise ValueError("Columns {} don't match the table's columns {}".format(
+                list(df.columns), list(self.columns)))
+        elif not df.dtypes.equals(self.dtypes):
+            different = [column for column in self.columns if df[column].dtype != self.dtypes[column]]
+            raise ValueError("Dtypes of columns {} don't match the table's dtypes".format(different))
+
+        self.chunks.append(df)
+        self.rows += len(df)
+        return self
+
+    def extend(self, frames):
+        """Add each DataFrame in frames to the table."""
+        for df in frames:
+            self.append(df)
+        return self
+
+    @property
+    def shape(self):
+        return (self.rows, 0 if self.columns is None else len(self.columns))
+
+    def __len__(self):
+        return self.rows
+
+    def head(self, n=5):
+        """Return the first n rows, only looking at as many DataFrames as needed."""
+        if not self.chunks:
+            return pd.DataFrame()
+        needed = []
+        count = 0
+        for df in self.chunks:
+            if count >= n:
+                break
+            needed.append(df.iloc[:n - count])
+            count += len(needed[-1])
+        result = pd.concat(needed, ignore_index=self.ignore_index)
+        return result if len(result) else self.chunks[0].iloc[:0]
+
+    def column(self, name):
+        """Return one column of the table as a Series, copying only that column."""
+        return pd.Series(self._build_column(name), index=self._build_index(), name=name)
+
+    def __getitem__(self, name):
+        return self.column(name)
+
+    def _build_index(self):
+        if self.ignore_index:
+            return pd.RangeIndex(self.rows)
+        # Index.append() with a list joins all of them in one go
+        return self.chunks[0].index.append([df.index for df in self.chunks[1:]])
+
+    def _build_column(self, name):
+        dtype = self.dtypes[name]
+        if not isinstance(dtype, np.dtype):
+            # pandas' own dtypes (category, string, ...) have their own way of joining
+            return pd.concat([df[name] for df in self.chunks], ignore_index=True).array
+
+        # make the final array once, then copy every chunk straight into its place
+        values = np.empty(self.rows, dtype=dtype)
+        start = 0
+        for df in self.chunks:
+            values[start:start + len(df)] = df[name].to_numpy()
+            start += len(df)
+        return values
+
+    def build(self):
+        """Return one DataFrame holding every row, the same as pd.concat() of everything added."""
+        if not self.chunks:
+            return pd.DataFrame()
+        data = {name: self._build_column(name) for name in self.columns}
+        return pd.DataFrame(data, index=self._build_index(), columns=self.columns, copy=False)
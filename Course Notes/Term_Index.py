@@ -0,0 +1,187 @@
+############
+# Term Index
+############
+
+"""
+The Pandas notes count how many wine descriptions mention "tropical" and "fruity" like this:
+
+n_trop = reviews.description.map(lambda desc: "tropical" in desc).sum()
+n_fruity = reviews.description.map(lambda desc: "fruity" in desc).sum()
+
+Every new word means another trip through all 130k descriptions. TermIndex reads the
+descriptions once and writes down, for every word, which rows it appears in (an "inverted
+index", like the one at the back of a book). After that, any count is just a lookup:
+
+index = TermIndex.build(reviews.description)
+index.save('description_index.npz')          # and TermIndex.load() next time
+
+descriptor_counts = index.count(['tropical', 'fruity'])
+index.co_occurrence(['tropical', 'fruity', 'citrus'])   # rows mentioning both words of each pair
+index.count_by(['tropical', 'fruity'], reviews.country) # a row per country, a column per word
+
+"tropical" in desc is True for "subtropical" too, and the index gives exactly the same
+answers. A word made only of letters, digits and underscores can only ever be found inside one
+of the words of a description (it can't run over a space or a comma). So the rows for
+"tropical" are the rows of every indexed word that contains "tropical" - "tropical",
+"subtropical", "tropicality" and so on.
+
+Finding those indexed words means searching the list of indexed words (tens of thousands)
+instead of the descriptions (130k, and much longer), with .str.contains(regex=False), which
+runs the search in pandas' compiled code rather than a Python loop.
+
+Words with spaces or punctuation in them ("full-bodied", "black cherry") can run over more
+than one indexed word. For those, the descriptions themselves are searched, the same way and
+one word at a time - count_terms_scan() does this without an index at all. That costs about
+the same as the lambda above, so building the index only pays off when the descriptions will
+be searched for a lot of words over time: building it takes about as long as searching for
+somewhere between a few dozen and a hundred words with count_terms_scan(). After that a new
+plain word only costs a search over the indexed words, and a repeated one costs nothing.
+"""
+
+import re
+
+import numpy as np
+import pandas as pd
+
+TOKEN = re.compile(r'\w+')
+
+
+def _is_word(term):
+    return TOKEN.fullmatch(term) is not None
+
+
+def scan_rows(texts, terms):
+    """Return {term: array of the row positions whose text contains term}."""
+    # values that aren't strings come back as missing, which na=False makes False
+    texts = pd.Series(texts)
+    return {term: np.flatnonzero(texts.str.contains(term, regex=False, na=False).to_numpy(dtype=bool))
+            for term in dict.fromkeys(terms)}
+
+
+def count_terms_scan(texts, terms):
+    """Return a Series counting the texts that contain each term, without building an index.
+
+    The same as texts.map(lambda desc: term in desc).sum() for every term.
+    """
+    rows = scan_rows(texts, terms)
+    return pd.Series([len(rows[term]) for term in terms], index=list(terms))
+
+
+class TermIndex:
+    """For every word in a text column, the (sorted) positions of the rows it appears in."""
+
+    def __init__(self, vocabulary, offsets, postings, n_rows, texts=None):
+        # the rows of vocabulary[i] are postings[offsets[i]:offsets[i + 1]]
+        self.vocabulary = vocabulary
+        self.offsets = offsets
+        self.postings = postings
+        self.n_rows = n_rows
+        # only kept when built in this session - needed for terms with spaces or punctuation
+        self.texts = texts
+        self._rows = {}
+
+    @classmethod
+    def build(cls, texts):
+        """Index every word (run of letters, digits and underscores) of texts."""
+        texts = pd.Series(texts)
+        # each word only once per row
+        tokens = [set(TOKEN.findall(text)) if isinstance(text, str) else () for text in texts]
+        lengths = np.array([len(row) for row in tokens], dtype=np.int64)
+        codes, vocabulary = pd.factorize(pd.Series([token for row in tokens for token in row],
+                                                   dtype=object))
+        rows = np.repeat(np.arange(len(texts), dtype=np.int32), lengths)
+
+        # sort the (word, row) pairs by word. The sort is stable and the rows were already in
+        # order, so each word's rows stay sorted
+        order = np.argsort(codes, kind='stable')
+        offsets = np.r_[0, np.cumsum(np.bincount(codes, minlength=len(vocabulary)))]
+        postings = rows[order]
+        return cls(np.asarray(vocabulary, dtype=object), offsets, postings, len(texts),
+                   texts.reset_index(drop=True))
+
+    def save(self, path):
+        np.savez_compressed(path, vocabulary=self.vocabulary.astype(str), offsets=self.offsets,
+                            postings=self.postings, n_rows=self.n_rows)
+
+    @classmethod
+    def load(cls, path, texts=None):
+        """Load an index saved with save(). Give texts to allow terms with spaces or punctuation."""
+        with np.load(path) as saved:
+            index = cls(saved['vocabulary'].astype(object), saved['offsets'], saved['postings'],
+                        int(saved['n_rows']))
+        if texts is not None:
+            if len(texts) != index.n_rows:
+                raise ValueError("texts has {} rows but the index was built from {}".format(
+                    len(texts), index.n_rows))
+            index.texts = pd.Series(texts).reset_index(drop=True)
+        return index
+
+    def _word_rows(self, code):
+        return self.postings[self.offsets[code]:self.offsets[code + 1]]
+
+    def _resolve(self, terms):
+        """Work out the rows of every term not looked up before, all in one go."""
+        new_terms = [term for term in dict.fromkeys(terms) if term not in self._rows]
+        words = [term for term in new_terms if _is_word(term)]
+        others = [term for term in new_terms if not _is_word(term)]
+
+        if words:
+            # search the indexed words, not the texts, for every indexed word containing each term
+            matches = scan_rows(self.vocabulary, words)
+            for term in words:
+                parts = [self._word_rows(code) for code in matches[term]]
+                self._rows[term] = np.unique(np.concatenate(parts)) if parts else \
+                    np.array([], dtype=np.int32)
+
+        if others:
+            if self.texts is None:
+                raise ValueError("Terms with spaces or punctuation ({}) need the texts - pass "
+                                 "texts= to TermIndex.load()".format(others))
+            self._rows.update(scan_rows(self.texts, others))
+
+    def rows(self, term):
+        """Return the sorted positions of the rows whose text contains term."""
+        self._resolve([term])
+        return self._rows[term]
+
+    def mask(self, term):
+        """Return a True/False array, the same as texts.map(lambda desc: term in desc)."""
+        mask = np.zeros(self.n_rows, dtype=bool)
+        mask[self.rows(term)] = True
+        return mask
+
+    def count(self, terms):
+        """Return a Series counting the rows whose text contains each term."""
+        terms = [terms] if isinstance(terms, str) else list(terms)
+        self._resolve(terms)
+        return pd.Series([len(self._rows[term]) for term in terms], index=terms)
+
+    def co_occurrence(self, terms):
+        """Return a DataFrame counting the rows that contain both terms of each pair (the
+        diagonal is count()).
+        """
+        terms = list(terms)
+        self._resolve(terms)
+        counts = np.zeros((len(terms), len(terms)), dtype=np.int64)
+        for i, first in enumerate(terms):
+            for j in range(i, len(terms)):
+                both = np.intersect1d(self._rows[first], self._rows[terms[j]], assume_unique=True)
+                counts[i, j] = counts[j, i] = len(both)
+        return pd.DataFrame(counts, index=terms, columns=terms)
+
+    def count_by(self, terms, groups):
+        """Return a DataFrame with a row per group and a column per term, counting the rows
+        of each group whose text contains the term. groups is a column in the same row order
+        as the texts (e.g. reviews.country); rows with a missing group are left out.
+        """
+        terms = [terms] if isinstance(terms, str) else list(terms)
+        if len(groups) != self.n_rows:
+            raise ValueError("groups has {} rows but the index has {}".format(len(groups), self.n_rows))
+        self._resolve(terms)
+        codes, names = pd.factorize(pd.Series(groups), sort=True)
+        counts = {}
+        for term in terms:
+            term_codes = codes[self._rows[term]]
+            counts[term] = np.bincount(term_codes[term_codes >= 0], minlength=len(names))
+        name = groups.name if isinstance(groups, pd.Series) else None
+        return pd.DataFrame(counts, index=pd.Index(names, name=name))
@@ -0,0 +1,129 @@
+#################
+# Top K Per Group
+#################
+
+"""
+Two of the example recipes in the Grouping and Sorting section use groupby().apply() with a
+lambda:
+
+# Pick out the best wine by country and province:
+reviews.groupby(['country', 'province']).apply(lambda df: df.loc[df.points.idxmax()])
+
+# Select the name of the first wine reviewed from each winery in the dataset:
+reviews.groupby('winery').apply(lambda df: df.title.iloc[0])
+
+apply() builds a whole new DataFrame for every group and then calls the lambda on it. With
+~16,000 wineries that is 16,000 little DataFrames, which takes far longer than the actual
+work of picking one row out of each group.
+
+The same answers can be found with a single sort of the whole DataFrame:
+
+1. Give every group a number (its "code") with groupby().ngroup().
+2. Sort the rows by code and then by points, biggest first. The sort is "stable", so rows
+with the same points stay in their original order - the same tie-break idxmax() uses.
+3. Now every group is one block of rows in a row, and the best row of each group is the
+first row of its block. The position of a row inside its block is its rank in the group.
+
+best_per_province = best_row_per_group(reviews, ['country', 'province'], 'points')
+first_titles = first_per_group(reviews, 'winery', 'title')
+top_three = top_k_per_group(reviews, 'country', 'points', k=3)
+top_three_with_ties = top_k_per_group(reviews, 'country', 'points', k=3, keep='all')
+"""
+
+import numpy as np
+import pandas as pd
+
+
+def _group_codes(df, by):
+    """Return a number for each row saying which group it is in (-1 for a missing key).
+
+    Groups are numbered in sorted order of their keys, like groupby() sorts them.
+    """
+    return df.groupby(by, sort=True).ngroup().to_numpy()
+
+
+def _block_starts(sorted_codes):
+    """Return where each block of equal codes starts in sorted_codes."""
+    if len(sorted_codes) == 0:
+        return np.array([], dtype=np.intp)
+    return np.flatnonzero(np.r_[True, sorted_codes[1:] != sorted_codes[:-1]])
+
+
+def _ranks(sorted_codes):
+    """Return the position of each row inside its block of equal codes (0 for the first)."""
+    starts = _block_starts(sorted_codes)
+    lengths = np.diff(np.r_[starts, len(sorted_codes)])
+    return np.arange(len(sorted_codes)) - np.repeat(starts, lengths)
+
+
+def _sorted_positions(df, by, column, ascending):
+    """Return the row positions sorted by group and then by column, keeping the original
+    order for ties. Rows with a missing key or value are left out.
+    """
+    codes = _group_codes(df, by)
+    values = df[column].to_numpy(dtype=float)
+    keep = (codes >= 0) & ~np.isnan(values)
+    positions = np.flatnonzero(keep)
+    values = values[keep] if ascending else -values[keep]
+    # np.lexsort sorts by the last key first and is stable, so ties keep their order
+    order = np.lexsort((values, codes[keep]))
+    return positions[order], codes[keep][order], values[order]
+
+
+def _index_by_group(df, positions, by):
+    result = df.iloc[positions]
+    keys = [by] if isinstance(by, str) else list(by)
+    if len(keys) == 1:
+        result.index = pd.Index(result[keys[0]].to_numpy(), name=keys[0])
+    else:
+        result.index = pd.MultiIndex.from_frame(result[keys])
+    return result
+
+
+def top_k_per_group(df, by, column, k=1, ascending=False, keep='first'):
+    """Return the k rows with the biggest values of column in each group of df.groupby(by).
+
+    Set ascending=True for the smallest values instead. Ties are broken by the original row
+    order when keep='first'; with keep='all', every row tied with the k-th row is kept too.
+    Rows with a missing value in column are never picked. The rows are returned in group
+    order, best first, with their original index.
+    """
+    if keep not in ('first', 'all'):
+        raise ValueError("keep must be 'first' or 'all'")
+    positions, codes, values = _sorted_positions(df, by, column, ascending)
+    ranks = _ranks(codes)
+    if keep == 'first':
+        chosen = ranks < k
+    else:
+        # the k-th value of each group (or its last value, for groups smaller than k)
+        starts = _block_starts(codes)
+        lengths = np.diff(np.r_[starts, len(codes)])
+        kth = values[starts + np.minimum(k, lengths) - 1]
+        chosen = values <= np.repeat(kth, lengths)
+    return df.iloc[positions[chosen]]
+
+
+def best_row_per_group(df, by, column):
+    """Return the same rows as df.groupby(by).apply(lambda df: df.loc[df[column].idxmax()]),
+    indexed by the group keys.
+    """
+    positions, codes, values = _sorted_positions(df, by, column, ascending=False)
+    return _index_by_group(df, positions[_block_starts(codes)], by)
+
+
+def first_n_per_group(df, by, n=1):
+    """Return the first n rows of each group, in group order and keeping the original index.
+
+    Unlike groupby().first(), missing values are kept - this is row order, like iloc.
+    """
+    codes = _group_codes(df, by)
+    positions = np.flatnonzero(codes >= 0)
+    order = np.argsort(codes[positions], kind='stable')
+    positions = positions[order]
+    return df.iloc[positions[_ranks(codes[positions]) < n]]
+
+
+def first_per_group(df, by, column):
+    """Return the same Series as df.groupby(by).apply(lambda df: df[column].iloc[0])."""
+    first_rows = first_n_per_group(df, by, n=1)
+    return _index_by_group(first_rows, np.arange(len(first_rows)), by)[column].rename(None)
@@ -0,0 +1,129 @@
+##########################################
+# Vectorized Rules (Star Ratings Example)
+##########################################
+
+"""
+The star ratings problem in the Pandas notes uses apply() with axis='columns', which calls
+the stars() function once for every row in the DataFrame. That works, but it is slow - on the
+130k row wine reviews dataset every row gets turned into its own Series before stars() sees it.
+
+Since the rules in stars() are just an ordered list of "if this column compares to this value,
+the answer is X", we can describe them as data instead of as an if/elif chain:
+
+star_rules = [
+    ('country', '==', 'Canada', 3),
+    ('points', '>=', 95, 3),
+    ('points', '>=', 85, 2),
+]
+
+compile_rules() turns a list like that into a function that checks every rule against whole
+columns at once and then uses np.select() to pick the first rule that matched for each row.
+np.select() works just like an if/elif chain - the first condition that is True wins, and the
+default is used when none of them are.
+
+stars = compile_rules(star_rules, default=1)
+star_ratings = stars(reviews)
+"""
+
+import time
+
+import numpy as np
+import pandas as pd
+
+# the comparisons a rule can use, mapped to the function that runs them on a whole column
+OPERATORS = {
+    '==': lambda column, value: column == value,
+    '!=': lambda column, value: column != value,
+    '>': lambda column, value: column > value,
+    '>=': lambda column, value: column >= value,
+    '<': lambda column, value: column < value,
+    '<=': lambda column, value: column <= value,
+    'isin': lambda column, value: column.isin(value),
+}
+
+# the same rules as the stars() function in the Pandas notes
+STAR_RULES = [
+    ('country', '==', 'Canada', 3),
+    ('points', '>=', 95, 3),
+    ('points', '>=', 85, 2),
+]
+
+
+def compile_rules(rules, default):
+    """Return a function that evaluates an ordered list of rules over a whole DataFrame.
+
+    Each rule is a (column, operator, value, result) tuple. Rules are checked in order and
+    the first one that matches a row decides that row's result, just like an if/elif chain.
+    Rows that match no rule get the default.
+
+    >>> stars = compile_rules(STAR_RULES, default=1)
+    >>> stars(reviews)
+    """
+    for column, operator, value, result in rules:
+        if operator not in OPERATORS:
+            raise ValueError("Unknown operator {!r} in rule for column {!r}".format(operator, column))
+
+    # copy the rules so changing the original list later doesn't change the compiled function
+    rules = list(rules)
+    results = [result for column, operator, value, result in rules]
+
+    def evaluate(df):
+        # build one True/False array per rule. Missing values (NaN) compare as False, which
+        # is the same thing the if/elif version does with them
+        conditions = [np.asarray(OPERATORS[operator](df[column], value), dtype=bool)
+                      for column, operator, value, result in rules]
+        return pd.Series(np.select(conditions, results, default=default), index=df.index)
+
+    return evaluate
+
+
+def stars(row):
+    """The row-by-row version of the star ratings from the Pandas notes, for comparison."""
+    if row.country == 'Canada':
+        return 3
+    elif row.points >= 95:
+        return 3
+    elif row.points >= 85:
+        return 2
+    else:
+        return 1
+
+
+def make_reviews(n_rows=129971, seed=0):
+    """Return a fake reviews DataFrame with the same shape of country/points data as winemag."""
+    rng = np.random.default_rng(seed)
+    countries = np.array(['US', 'France', 'Italy', 'Spain', 'Portugal', 'Chile',
+                          'Argentina', 'Austria', 'Australia', 'Canada'], dtype=object)
+    country = rng.choice(countries, size=n_rows)
+    # winemag has a few rows with no country, so leave some of them empty
+    country[rng.random(n_rows) < 0.001] = np.nan
+    points = rng.integers(80, 101, size=n_rows)
+    return pd.DataFrame({'country': country, 'points': points})
+
+
+def benchmark_stars(n_rows=129971, seed=0):
+    """Time reviews.apply(stars, axis='columns') against the compiled rules and check that
+    both give exactly the same star ratings.
+    """
+    reviews = make_reviews(n_rows, seed)
+    compiled_stars = compile_rules(STAR_RULES, default=1)
+
+    start = time.perf_counter()
+    expected = reviews.apply(stars, axis='columns')
+    apply_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    star_ratings = compiled_stars(reviews)
+    compiled_seconds = time.perf_counter() - start
+
+    pd.testing.assert_series_equal(star_ratings, expected)
+
+    print("Rows:", n_rows)
+    print("apply(stars, axis='columns'): {:.3f}s".format(apply_seconds))
+    print("compile_rules(STAR_RULES):    {:.4f}s".format(compiled_seconds))
+    print("Speedup: {:,.0f}x".format(apply_seconds / compiled_seconds))
+    return apply_seconds, compiled_seconds
+
+
+if __name__ == '__main__':
+    benchmark_stars()